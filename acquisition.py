@@ -0,0 +1,150 @@
+# acquisition.py
+import argparse
+import asyncio
+import os
+import time
+
+import serial
+
+from sensor_store import SensorStore
+from serial_reader import StreamDecoder
+
+
+class MultiPortReader:
+    """
+    Reads many Arduino ports from one asyncio loop and merges their blocks
+    into a single bounded queue of dicts tagged with "tank" and "ts".
+
+    Each port may speak the text protocol or binary frames; StreamDecoder
+    picks per port.
+
+    Backpressure: when the queue is full a port's reader stops pulling bytes,
+    its stream buffer fills to 2 * line_limit and the transport pauses reading,
+    so memory per port stays bounded no matter how slow the consumer is.
+    """
+
+    def __init__(self, ports, baud=9600, queue_size=1000, line_limit=256,
+                 reset_delay=1.0, reconnect_delay=5.0):
+        # ports: {tank_id: port} or a list of ports (the port name is the tank id)
+        if not isinstance(ports, dict):
+            ports = {p: p for p in ports}
+        self.ports = ports
+        self.baud = baud
+        self.line_limit = line_limit
+        self.reset_delay = reset_delay
+        self.reconnect_delay = reconnect_delay
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.stats = {
+            tank: {"blocks": 0, "overruns": 0, "reconnects": 0, "errors": 0,
+                   "dropped": 0, "crc_errors": 0}
+            for tank in ports
+        }
+        self._tasks = []
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._run_port(tank, port), name=f"tank-{tank}")
+            for tank, port in self.ports.items()
+        ]
+        return self
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+    async def _open(self, tank, port):
+        """Open a port and return (async chunk iterator, close callback)."""
+        ser = serial.Serial(port, self.baud, timeout=0)
+        if os.name != "posix":
+            # No fd readiness on Windows event loops; fall back to pooled blocking reads.
+            ser.timeout = 1
+            return self._threaded_chunks(ser), ser.close
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=self.line_limit)
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), ser
+        )
+        return self._stream_chunks(reader), transport.close
+
+    async def _stream_chunks(self, reader):
+        while True:
+            chunk = await reader.read(self.line_limit)
+            if not chunk:
+                return
+            yield chunk
+
+    async def _threaded_chunks(self, ser):
+        while ser.is_open:
+            chunk = await asyncio.to_thread(lambda: ser.read(ser.in_waiting or 1))
+            if chunk:
+                yield chunk
+
+    async def _run_port(self, tank, port):
+        tank_stats = self.stats[tank]
+        first = True
+        while True:
+            if not first:
+                tank_stats["reconnects"] += 1
+                await asyncio.sleep(self.reconnect_delay)
+            first = False
+            try:
+                chunks, close = await self._open(tank, port)
+            except (serial.SerialException, OSError):
+                tank_stats["errors"] += 1
+                continue
+            try:
+                await asyncio.sleep(self.reset_delay)  # give Arduino reset time
+                decoder = StreamDecoder(self.line_limit)
+                counted = decoder.stats()
+                async for chunk in chunks:
+                    readings = decoder.feed(chunk)
+                    now = decoder.stats()
+                    for key in ("dropped", "crc_errors", "overruns"):
+                        tank_stats[key] += now[key] - counted[key]
+                    counted = now
+                    for data in readings:
+                        data["tank"] = tank
+                        data["ts"] = time.time()
+                        tank_stats["blocks"] += 1
+                        await self.queue.put(data)
+            except (serial.SerialException, OSError):
+                tank_stats["errors"] += 1
+            finally:
+                close()
+
+
+async def _print_readings(ports, baud, store=None):
+    async with MultiPortReader(ports, baud=baud) as reader:
+        async for data in reader:
+            if store is not None:
+                store.tank(data["tank"]).append(data)
+            print(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read several Arduino tanks at once.")
+    parser.add_argument("ports", nargs="+", help="serial ports, optionally as TANK=PORT")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--store", help="directory to persist readings in (see sensor_store.py)")
+    args = parser.parse_args()
+
+    ports = dict(p.split("=", 1) if "=" in p else (p, p) for p in args.ports)
+    try:
+        store = SensorStore(args.store) if args.store else None
+        asyncio.run(_print_readings(ports, args.baud, store))
+    except KeyboardInterrupt:
+        pass
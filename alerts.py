@@ -0,0 +1,166 @@
+# alerts.py
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+
+from serial_reader import FIELDS
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+RULES_PATH = os.path.join(BASE, "alert_rules.json")
+
+# Rule direction: +1 fires above the threshold, -1 below it.
+_OPS = {">": 1.0, ">=": 1.0, "<": -1.0, "<=": -1.0}
+
+
+def load_rules(path=RULES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["rules"]
+
+
+class AlertEngine:
+    """
+    Threshold rules compiled into arrays and evaluated for many tanks at once.
+
+    Each rule: {"id", "field", "op" (< <= > >=), "threshold", "clear", "for",
+    "clear_for", "level", "message"}. A rule fires once its condition has held
+    for `for` consecutive readings of a tank, and clears only after the value
+    has come back past `clear` (the hysteresis band) for `clear_for` readings.
+    NaN readings leave the state untouched. Per-tank state lives in
+    (tanks, rules) arrays, so a batch costs the same few NumPy ops at any tank count.
+    """
+
+    def __init__(self, rules, fields=FIELDS):
+        self.fields = tuple(fields)
+        self.rules = list(rules)
+        self.ids = [r["id"] for r in self.rules]
+        self.levels = [r.get("level", "warning") for r in self.rules]
+        self.messages = [r.get("message", r["id"]) for r in self.rules]
+        try:
+            self._field = np.array([self.fields.index(r["field"]) for r in self.rules], dtype=np.intp)
+            self._sign = np.array([_OPS[r["op"]] for r in self.rules])
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"Invalid alert rule: {e}")
+        self._inclusive = np.array([r["op"] in ("<=", ">=") for r in self.rules])
+        self._threshold = np.array([float(r["threshold"]) for r in self.rules])
+        self._clear = np.array([float(r.get("clear", r["threshold"])) for r in self.rules])
+        self._for = np.array([int(r.get("for", 1)) for r in self.rules])
+        self._clear_for = np.array([int(r.get("clear_for", 1)) for r in self.rules])
+        bad = self._sign * (self._clear - self._threshold) > 0
+        if bad.any():
+            raise ValueError(f"'clear' must be on the safe side of 'threshold' for {[self.ids[i] for i in np.flatnonzero(bad)]}")
+
+        self.tanks = {}  # tank id -> state row
+        n = len(self.rules)
+        self.active = np.zeros((0, n), dtype=bool)
+        self._breach_count = np.zeros((0, n), dtype=np.int32)
+        self._clear_count = np.zeros((0, n), dtype=np.int32)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path=RULES_PATH):
+        return cls(load_rules(path))
+
+    def _rows(self, tanks):
+        rows = np.empty(len(tanks), dtype=np.intp)
+        for i, tank in enumerate(tanks):
+            row = self.tanks.get(tank)
+            if row is None:
+                row = self.tanks[tank] = len(self.tanks)
+            rows[i] = row
+        grow = len(self.tanks) - len(self.active)
+        if grow > 0:
+            pad = ((0, max(grow, len(self.active))), (0, 0))  # amortized doubling
+            self.active = np.pad(self.active, pad)
+            self._breach_count = np.pad(self._breach_count, pad)
+            self._clear_count = np.pad(self._clear_count, pad)
+        return rows
+
+    def evaluate(self, tanks, values):
+        """
+        Update state with one batch: tanks is a sequence of n tank ids and values
+        an (n, len(fields)) array of readings. A tank may appear more than once;
+        its readings are applied in order. Returns (fired, cleared) lists of
+        (tank, rule id) pairs.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(len(tanks), len(self.fields))
+        with self._lock:
+            rows = self._rows(tanks)
+            # Rank of each reading within its tank: round k holds every tank's k-th reading.
+            order = np.argsort(rows, kind="stable")
+            sorted_rows = rows[order]
+            starts = np.r_[0, np.flatnonzero(np.diff(sorted_rows)) + 1]
+            rank = np.empty(len(rows), dtype=np.intp)
+            rank[order] = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+
+            fired, cleared = [], []
+            for k in range(int(rank.max()) + 1 if len(rank) else 0):
+                sel = rank == k
+                f, c = self._step(rows[sel], values[sel])
+                fired.extend(f)
+                cleared.extend(c)
+        names = list(self.tanks)
+        return ([(names[r], self.ids[j]) for r, j in fired],
+                [(names[r], self.ids[j]) for r, j in cleared])
+
+    def _step(self, rows, values):
+        v = values[:, self._field]  # (n, rules)
+        known = ~np.isnan(v)
+        over = self._sign * (v - self._threshold)
+        breach = known & np.where(self._inclusive, over >= 0, over > 0)
+        safe = known & (self._sign * (v - self._clear) <= 0)
+
+        active = self.active[rows]
+        breach_count = np.where(breach, self._breach_count[rows] + 1, np.where(known, 0, self._breach_count[rows]))
+        clear_count = np.where(safe, self._clear_count[rows] + 1, np.where(known, 0, self._clear_count[rows]))
+        fire = ~active & (breach_count >= self._for)
+        clear = active & (clear_count >= self._clear_for)
+        active = (active | fire) & ~clear
+
+        self.active[rows] = active
+        self._breach_count[rows] = breach_count
+        self._clear_count[rows] = np.where(fire, 0, clear_count)
+        fr, fc = np.nonzero(fire)
+        cr, cc = np.nonzero(clear)
+        return list(zip(rows[fr].tolist(), fc.tolist())), list(zip(rows[cr].tolist(), cc.tolist()))
+
+    def update(self, tank, reading):
+        """Evaluate one reading dict (e.g. from parse_block) for one tank."""
+        values = [reading.get(f, np.nan) for f in self.fields]
+        return self.evaluate([tank], [values])
+
+    def active_alerts(self, tank):
+        """[(level, message, rule id)] currently active for a tank, in rule order."""
+        with self._lock:
+            row = self.tanks.get(tank)
+            if row is None:
+                return []
+            return [(self.levels[j], self.messages[j], self.ids[j]) for j in np.flatnonzero(self.active[row])]
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Check alert rules against a stored tank history.")
+    parser.add_argument("--rules", default=RULES_PATH)
+    parser.add_argument("--store", help="sensor_store directory (default: store/)")
+    args = parser.parse_args()
+
+    from sensor_store import SensorStore
+
+    engine = AlertEngine.from_config(args.rules)
+    store = SensorStore(args.store) if args.store else SensorStore()
+    for tank in store.tanks():
+        rec = store.tank(tank).query()
+        values = np.column_stack([rec[f] for f in FIELDS])
+        t = time.perf_counter()
+        for i in range(len(values)):
+            fired, cleared = engine.evaluate([tank], values[i:i + 1])
+            for _, rule in fired:
+                print(f"⚠ {tank} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(rec['ts'][i]))} {rule} fired")
+            for _, rule in cleared:
+                print(f"✅ {tank} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(rec['ts'][i]))} {rule} cleared")
+        print(f"{tank}: {len(values)} readings in {time.perf_counter() - t:.2f}s, "
+              f"active: {[a[2] for a in engine.active_alerts(tank)]}")
@@ -0,0 +1,145 @@
+// hydro_sensors.ino
+// Reference sketch for the tank board (Arduino Uno).
+//
+// Text mode prints the blocks serial_reader.parse_block expects:
+//   TDS: 652.41 ppm / pH: 6.21 / Water Level: 1 / Light: 8012 / Temperature: 24.06 / ------
+// Binary mode (BINARY_FRAMES 1) sends one 16-byte frame per reading instead,
+// little-endian, matching serial_reader.FRAME:
+//   0xAA 0x55 | version u8 | seq u16 | tds u16 (0.1 ppm) | ph u16 (0.01)
+//   | water_level u8 | light u16 | temperature i16 (0.01 C) | CRC16 u16
+// The CRC is CRC-16/CCITT-FALSE over version..temperature.
+// The host auto-detects the mode, so either build works with the dashboard.
+
+#include <OneWire.h>
+#include <DallasTemperature.h>
+
+#define BINARY_FRAMES 0
+#define FRAME_VERSION 1
+
+const uint8_t PH_PIN = A0;
+const uint8_t TDS_PIN = A1;
+const uint8_t LIGHT_PIN = A2;
+const uint8_t WATER_LEVEL_PIN = 2;
+const uint8_t TEMP_PIN = 4;
+
+const float VREF = 5.0;
+const float PH_OFFSET = 0.0;        // calibrate against pH 7.0 buffer
+const float LUX_PER_COUNT = 12.0;   // calibrate LDR divider against a lux meter
+
+#if BINARY_FRAMES
+const unsigned long INTERVAL_MS = 100;
+#else
+const unsigned long INTERVAL_MS = 1000;
+#endif
+
+OneWire oneWire(TEMP_PIN);
+DallasTemperature tempSensor(&oneWire);
+uint16_t seq = 0;
+
+struct __attribute__((packed)) Frame {
+  uint8_t sync[2];
+  uint8_t version;
+  uint16_t seq;
+  uint16_t tds;
+  uint16_t ph;
+  uint8_t waterLevel;
+  uint16_t light;
+  int16_t temperature;
+  uint16_t crc;
+};
+
+uint16_t crc16(const uint8_t *data, size_t len) {
+  uint16_t crc = 0xFFFF;
+  while (len--) {
+    crc ^= (uint16_t)(*data++) << 8;
+    for (uint8_t i = 0; i < 8; i++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+float averageAnalog(uint8_t pin) {
+  long sum = 0;
+  for (uint8_t i = 0; i < 10; i++) {
+    sum += analogRead(pin);
+  }
+  return sum / 10.0;
+}
+
+float readTemperature() {
+  tempSensor.requestTemperatures();
+  float t = tempSensor.getTempCByIndex(0);
+  return t == DEVICE_DISCONNECTED_C ? 25.0 : t;
+}
+
+float readTds(float temperature) {
+  float voltage = averageAnalog(TDS_PIN) * VREF / 1024.0;
+  float compensated = voltage / (1.0 + 0.02 * (temperature - 25.0));
+  return (133.42 * compensated * compensated * compensated
+          - 255.86 * compensated * compensated
+          + 857.39 * compensated) * 0.5;
+}
+
+float readPh() {
+  float voltage = averageAnalog(PH_PIN) * VREF / 1024.0;
+  return 3.5 * voltage + PH_OFFSET;
+}
+
+uint16_t clampU16(float value) {
+  if (value < 0) return 0;
+  if (value > 65535) return 65535;
+  return (uint16_t)(value + 0.5);
+}
+
+void sendFrame(float tds, float ph, uint8_t waterLevel, uint16_t light, float temperature) {
+  Frame f;
+  f.sync[0] = 0xAA;
+  f.sync[1] = 0x55;
+  f.version = FRAME_VERSION;
+  f.seq = seq++;
+  f.tds = clampU16(tds * 10);
+  f.ph = clampU16(ph * 100);
+  f.waterLevel = waterLevel;
+  f.light = light;
+  f.temperature = (int16_t)round(temperature * 100);
+  f.crc = crc16(&f.version, sizeof(Frame) - 4);
+  Serial.write((const uint8_t *)&f, sizeof(Frame));
+}
+
+void sendText(float tds, float ph, uint8_t waterLevel, uint16_t light, float temperature) {
+  Serial.print("TDS: "); Serial.print(tds, 2); Serial.println(" ppm");
+  Serial.print("pH: "); Serial.println(ph, 2);
+  Serial.print("Water Level: "); Serial.println(waterLevel);
+  Serial.print("Light: "); Serial.println(light);
+  Serial.print("Temperature: "); Serial.println(temperature, 2);
+  Serial.println("------");
+}
+
+void setup() {
+  Serial.begin(9600);
+  pinMode(WATER_LEVEL_PIN, INPUT_PULLUP);
+  tempSensor.begin();
+  tempSensor.setWaitForConversion(BINARY_FRAMES ? false : true);
+}
+
+void loop() {
+  static unsigned long last = 0;
+  unsigned long now = millis();
+  if (now - last < INTERVAL_MS) {
+    return;
+  }
+  last = now;
+
+  float temperature = readTemperature();
+  float tds = readTds(temperature);
+  float ph = readPh();
+  uint8_t waterLevel = digitalRead(WATER_LEVEL_PIN) == LOW ? 1 : 0;
+  uint16_t light = clampU16(averageAnalog(LIGHT_PIN) * LUX_PER_COUNT);
+
+#if BINARY_FRAMES
+  sendFrame(tds, ph, waterLevel, light, temperature);
+#else
+  sendText(tds, ph, waterLevel, light, temperature);
+#endif
+}
@@ -0,0 +1,211 @@
+# arduino_sim.py
+import argparse
+import heapq
+import os
+import pty
+import random
+import threading
+import time
+import tty
+
+from serial_reader import SEPARATOR, encode_frame, parse_block
+
+# Nominal readings the simulated sensors wander around.
+BASELINE = {
+    "tds": 650.0,
+    "ph": 6.2,
+    "water_level": 1,
+    "light": 8000,
+    "temperature": 24.0,
+}
+
+MALFORMED_LINES = [
+    b"TDS: ppm",
+    b"pH: nan",
+    b"Temp\xff\xfe:ure 2",
+    b"Light:",
+    b"Water Lev",
+    b"\x00\x00\x00",
+]
+
+
+class VirtualArduino:
+    """
+    One simulated board on a pseudo-terminal. Open `port` like a real serial port.
+    Emits TDS/pH/Water Level/Light/Temperature blocks with '------' separators
+    (or binary frames with binary=True), with configurable noise, drift, malformed lines, dropouts and hang-ups,
+    or replays blocks from a captured log.
+    """
+
+    def __init__(self, rate=1.0, noise=0.01, drift=0.0, malformed=0.0,
+                 dropout=0.0, dropout_seconds=5.0, hangup_after=None,
+                 replay=None, seq=False, binary=False, seed=None):
+        self.rate = rate  # blocks per second
+        self.noise = noise  # relative gaussian noise per reading
+        self.drift = drift  # relative random-walk step per block
+        self.malformed = malformed  # probability a block has a corrupt line
+        self.dropout = dropout  # probability per block of going silent
+        self.dropout_seconds = dropout_seconds
+        self.hangup_after = hangup_after  # close the pty after this many blocks
+        self.seq = seq  # add a 'Seq:' line so a harness can match blocks
+        self.binary = binary  # CRC16 frames (always carry seq) instead of text
+        self.rng = random.Random(seed)
+        self.level = dict(BASELINE)
+        self.blocks_sent = 0
+        self.sent_at = {}  # seq -> perf_counter() at write, when seq=True or binary=True
+        self._replay = _load_blocks(replay) if replay else None
+
+        self.master, slave = pty.openpty()
+        tty.setraw(slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(slave)
+        self._slave = slave  # kept open so the pty survives reader reconnects
+        self.closed = False
+
+    def next_block(self):
+        if self.binary:
+            return self._next_frame()
+        if self._replay:
+            block = self._replay[self.blocks_sent % len(self._replay)]
+            lines = block.splitlines()
+        else:
+            lines = self._generate()
+        if self.malformed and self.rng.random() < self.malformed:
+            lines[self.rng.randrange(len(lines))] = self.rng.choice(MALFORMED_LINES)
+        if self.seq:
+            # 16-bit like the binary frame's seq field, so sent_at keys match either way
+            lines.append(b"Seq: %d" % (self.blocks_sent & 0xFFFF))
+        lines.append(SEPARATOR)
+        return b"\r\n".join(lines) + b"\r\n"
+
+    def _next_frame(self):
+        if self._replay:
+            reading = parse_block(self._replay[self.blocks_sent % len(self._replay)])
+            reading = dict(BASELINE, **reading)
+        else:
+            reading = parse_block(b"\n".join(self._generate()))
+        frame = bytearray(encode_frame(reading, self.blocks_sent))
+        if self.malformed and self.rng.random() < self.malformed:
+            frame[self.rng.randrange(len(frame))] ^= 1 << self.rng.randrange(8)
+        return bytes(frame)
+
+    def _generate(self):
+        rng, level = self.rng, self.level
+        if self.drift:
+            for key in level:
+                level[key] *= 1 + rng.gauss(0, self.drift)
+        v = {k: x * (1 + rng.gauss(0, self.noise)) for k, x in level.items()}
+        return [
+            b"TDS: %.2f ppm" % v["tds"],
+            b"pH: %.2f" % v["ph"],
+            b"Water Level: %d" % round(v["water_level"]),
+            b"Light: %d" % v["light"],
+            b"Temperature: %.2f" % v["temperature"],
+        ]
+
+    def step(self):
+        """Write one block. Returns seconds until the next one, or None once hung up."""
+        if self.closed:
+            return None
+        if self.hangup_after is not None and self.blocks_sent >= self.hangup_after:
+            self.close()
+            return None
+        if self.dropout and self.rng.random() < self.dropout:
+            return self.dropout_seconds
+        block = self.next_block()
+        if self.seq or self.binary:
+            self.sent_at[self.blocks_sent & 0xFFFF] = time.perf_counter()
+        try:
+            os.write(self.master, block)
+        except OSError:
+            # Reader-side buffer full (nobody reading): the block is lost, like on a real UART.
+            pass
+        self.blocks_sent += 1
+        return 1.0 / self.rate
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            os.close(self.master)
+            os.close(self._slave)
+
+
+class Fleet:
+    """Drives many VirtualArduinos from one scheduler thread."""
+
+    def __init__(self, sims):
+        self.sims = sims
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="arduino-fleet", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        now = time.monotonic()
+        # Stagger start times so blocks do not all land in the same instant.
+        queue = [(now + i / (len(self.sims) * s.rate), i) for i, s in enumerate(self.sims)]
+        heapq.heapify(queue)
+        while queue and not self._stop.is_set():
+            due, i = queue[0]
+            delay = due - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            heapq.heappop(queue)
+            interval = self.sims[i].step()
+            if interval is not None:
+                heapq.heappush(queue, (max(due + interval, time.monotonic()), i))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for sim in self.sims:
+            sim.close()
+
+
+def _load_blocks(path):
+    """Split a captured serial log into blocks (without separator lines)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    blocks, current = [], []
+    for line in data.splitlines():
+        if SEPARATOR in line:
+            if current:
+                blocks.append(b"\r\n".join(current))
+            current = []
+        elif line.strip():
+            current.append(line.rstrip(b"\r"))
+    if not blocks:
+        raise ValueError(f"No blocks found in {path}")
+    return blocks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate Arduino boards on pseudo-terminals.")
+    parser.add_argument("-n", "--tanks", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=1.0, help="blocks per second per tank")
+    parser.add_argument("--noise", type=float, default=0.01)
+    parser.add_argument("--drift", type=float, default=0.0)
+    parser.add_argument("--malformed", type=float, default=0.0, help="probability of a corrupt line per block")
+    parser.add_argument("--dropout", type=float, default=0.0, help="probability of going silent per block")
+    parser.add_argument("--hangup-after", type=int, help="close each pty after this many blocks")
+    parser.add_argument("--replay", help="captured serial log to replay")
+    parser.add_argument("--binary", action="store_true", help="send CRC16 binary frames instead of text")
+    args = parser.parse_args()
+
+    sims = [
+        VirtualArduino(rate=args.rate, noise=args.noise, drift=args.drift, malformed=args.malformed,
+                       dropout=args.dropout, hangup_after=args.hangup_after, replay=args.replay, binary=args.binary, seed=i)
+        for i in range(args.tanks)
+    ]
+    for i, sim in enumerate(sims):
+        print(f"tank{i}={sim.port}")
+    fleet = Fleet(sims).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fleet.stop()
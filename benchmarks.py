@@ -0,0 +1,351 @@
+# benchmarks.py
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE, "bench_baseline.json")
+MODEL_PATH = os.path.join(BASE, "models", "npk_model.pkl")
+
+GOOD_BLOCK = (
+    b"TDS: 652.41 ppm\r\npH: 6.21\r\nWater Level: 1\r\nLight: 8012\r\n"
+    b"Temperature: 24.06\r\n------\r\n"
+)
+MALFORMED_BLOCK = (
+    b"TDS: ppm\r\npH: nan\r\nWater Lev\r\nLight:\r\n"
+    b"Temp\xff\xfe:ure 2\r\n\x00\x00\r\n------\r\n"
+)
+
+BENCHMARKS = {}
+
+
+def benchmark(name, number=1000, repeat=5):
+    """Register fn(setup_state) to be timed `number` times per repeat."""
+    def wrap(fn):
+        BENCHMARKS[name] = (fn, number, repeat)
+        return fn
+    return wrap
+
+
+class Skip(Exception):
+    pass
+
+
+def _load_model():
+    if not os.path.exists(MODEL_PATH):
+        raise Skip("models/npk_model.pkl not found (run train_model.py)")
+    import joblib
+    return joblib.load(MODEL_PATH)
+
+
+def _model_rows(n):
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "plant": ["Tomato"] * n,
+        "stage": ["Vegetative"] * n,
+        "temperature": rng.uniform(18, 32, n),
+        "humidity": 65,
+        "light_lux": rng.uniform(3000, 12000, n),
+        "age_days": 30,
+    })
+
+
+# --- parsing ---------------------------------------------------------------
+
+@benchmark("parse_block.realistic", number=20000)
+def bench_parse_good():
+    from serial_reader import parse_block
+    return lambda: parse_block(GOOD_BLOCK)
+
+
+@benchmark("parse_block.malformed", number=20000)
+def bench_parse_bad():
+    from serial_reader import parse_block
+    return lambda: parse_block(MALFORMED_BLOCK)
+
+
+@benchmark("parse_block.dashboard_complete", number=20000)
+def bench_parse_dashboard():
+    # streamlit_app.parse_arduino_block: shared parser plus the all-fields check.
+    # (streamlit_app itself cannot be imported without starting the app.)
+    from serial_reader import FIELDS, parse_block
+
+    def run():
+        data = parse_block(GOOD_BLOCK)
+        return data if all(f in data for f in FIELDS) else None
+    return run
+
+
+@benchmark("parse_log.10k_blocks", number=1, repeat=5)
+def bench_parse_log():
+    from serial_reader import parse_log
+    log = (GOOD_BLOCK * 9 + MALFORMED_BLOCK) * 1000
+    return lambda: parse_log(log)
+
+
+@benchmark("stream_decoder.text_1k_blocks", number=5)
+def bench_decode_text():
+    from serial_reader import StreamDecoder
+    data = GOOD_BLOCK * 1000
+    return lambda: StreamDecoder().feed(data)
+
+
+@benchmark("stream_decoder.binary_1k_frames", number=5)
+def bench_decode_binary():
+    from serial_reader import StreamDecoder, encode_frame, parse_block
+    reading = parse_block(GOOD_BLOCK)
+    data = b"".join(encode_frame(reading, i) for i in range(1000))
+    return lambda: StreamDecoder().feed(data)
+
+
+# --- estimate ----------------------------------------------------------------
+
+@benchmark("estimate_npk.single", number=20000)
+def bench_estimate_single():
+    from estimate_npk import estimate_npk_from_tds
+    return lambda: estimate_npk_from_tds(652.4, "Tomato", "Vegetative")
+
+
+@benchmark("estimate_npk.loop_1000", number=10)
+def bench_estimate_loop():
+    from estimate_npk import estimate_npk_from_tds
+    tds = np.random.default_rng(0).uniform(100, 1200, 1000).tolist()
+
+    def run():
+        for v in tds:
+            estimate_npk_from_tds(v, "Tomato", "Vegetative")
+    return run
+
+
+@benchmark("estimate_npk.batch_100k", number=10)
+def bench_estimate_batch():
+    from estimate_npk import estimate_npk_batch, encode_plant_stage
+    n = 100_000
+    tds = np.random.default_rng(0).uniform(100, 1200, n)
+    plant_codes, stage_codes = encode_plant_stage(["Tomato"] * n, ["Vegetative"] * n)
+    return lambda: estimate_npk_batch(tds, plant_codes, stage_codes)
+
+
+# --- model -------------------------------------------------------------------
+
+@benchmark("model.predict.single_row", number=5, repeat=3)
+def bench_predict_single():
+    model = _load_model()
+    row = _model_rows(1)
+    return lambda: model.predict(row)
+
+
+@benchmark("model.predict.batch_1000", number=1, repeat=3)
+def bench_predict_batch():
+    model = _load_model()
+    rows = _model_rows(1000)
+    return lambda: model.predict(rows)
+
+
+@benchmark("flat_forest.load_mmap", number=20)
+def bench_forest_load():
+    from forest_compiler import FOREST_PATH, FlatForest
+    if not os.path.isdir(FOREST_PATH):
+        raise Skip("models/npk_forest not found (run train_model.py)")
+    return lambda: FlatForest.load(FOREST_PATH, mmap_mode="r")
+
+
+@benchmark("flat_forest.predict_one", number=200)
+def bench_forest_predict():
+    from forest_compiler import FOREST_PATH, FlatForest
+    if not os.path.isdir(FOREST_PATH):
+        raise Skip("models/npk_forest not found (run train_model.py)")
+    forest = FlatForest.load(FOREST_PATH, mmap_mode="r")
+    return lambda: forest.predict_one("Tomato", "Vegetative", 26.0, 9000)
+
+
+@benchmark("flat_forest.walk_batch_1000", number=1, repeat=3)
+def bench_forest_walk_batch():
+    # NumPy walk only; compare with model.predict.batch_1000
+    from forest_compiler import FOREST_PATH, INPUT_COLUMNS, FlatForest
+    if not os.path.isdir(FOREST_PATH):
+        raise Skip("models/npk_forest not found (run train_model.py)")
+    forest = FlatForest.load(FOREST_PATH, mmap_mode="r")
+    rows = _model_rows(1000)
+    X = forest.encode({c: rows[c].to_numpy() for c in INPUT_COLUMNS})
+    return lambda: forest.predict_encoded(X)
+
+
+@benchmark("flat_forest.predict_batch_1000", number=1, repeat=3)
+def bench_forest_predict_batch():
+    # What load_model() callers get: batches this large go to the sklearn pipeline
+    from model_store import load_model
+    kind, model = load_model()
+    if kind != "mmap":
+        raise Skip("models/npk_forest not found (run train_model.py)")
+    rows = _model_rows(1000)
+    model.predict(rows)  # load the pipeline outside the timing
+    return lambda: model.predict(rows)
+
+
+# --- dosing ------------------------------------------------------------------
+
+@benchmark("dosing.compute_dose", number=20000)
+def bench_dose():
+    from dosing import compute_dose
+    return lambda: compute_dose((180.0, 60.0, 200.0), 350.0, 10.0)
+
+
+@benchmark("dosing.compute_doses_10k", number=100)
+def bench_doses():
+    from dosing import compute_doses
+    rng = np.random.default_rng(0)
+    pred, tds, water = rng.uniform(20, 300, (10_000, 3)), rng.uniform(0, 1000, 10_000), rng.uniform(1, 100, 10_000)
+    return lambda: compute_doses(pred, tds, water)
+
+
+# --- smoothing -----------------------------------------------------------------
+
+@benchmark("smoothing.stream_update", number=20000)
+def bench_smooth_stream():
+    from serial_reader import parse_block
+    from smoothing import StreamFilter
+    filt = StreamFilter()
+    reading = parse_block(GOOD_BLOCK)
+    return lambda: filt.update(reading)
+
+
+@benchmark("smoothing.history_100k", number=5)
+def bench_smooth_history():
+    from smoothing import filter_history
+    values = 600 + np.random.default_rng(0).normal(0, 20, 100_000)
+    return lambda: filter_history(values)
+
+
+# --- trends ------------------------------------------------------------------
+
+@benchmark("trends.lttb_1m_to_600", number=5)
+def bench_lttb():
+    from trends import lttb
+    x = np.arange(1_000_000, dtype=np.float64)
+    y = np.cumsum(np.random.default_rng(0).normal(size=len(x)))
+    return lambda: lttb(x, y, 600)
+
+
+# --- alerts ------------------------------------------------------------------
+
+@benchmark("alerts.evaluate_1k_tanks", number=200)
+def bench_alerts():
+    from alerts import AlertEngine
+    engine = AlertEngine.from_config()
+    tanks = list(range(1000))
+    values = np.random.default_rng(0).normal([600, 6.2, 1, 8000, 24], [300, 0.6, 0, 100, 3], (1000, 5))
+    return lambda: engine.evaluate(tanks, values)
+
+
+# --- training ----------------------------------------------------------------
+
+@benchmark("train_model.fit", number=1, repeat=1)
+def bench_train():
+    from train_model import FEATURES, TARGETS, build_model, load_dataset
+    df = load_dataset(os.path.join(BASE, "data", "hydro_data.csv"))
+    return lambda: build_model().fit(df[FEATURES], df[TARGETS])
+
+
+def run_benchmarks(only=None, scale=1.0):
+    results = {}
+    for name, (setup, number, repeat) in BENCHMARKS.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        try:
+            fn = setup()
+        except Skip as e:
+            print(f"⏭  {name}: skipped ({e})")
+            continue
+        number = max(1, int(number * scale))
+        fn()  # warm up caches and lazy imports
+        times = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - t) / number)
+        results[name] = {
+            "median_s": statistics.median(times),
+            "min_s": min(times),
+            "number": number,
+            "repeat": repeat,
+        }
+        print(f"{name:<34} {_fmt(results[name]['median_s']):>10} per call")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return the benchmarks whose median regressed more than threshold vs the baseline."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"⚠️ {name:<34} not in baseline")
+            continue
+        ratio = r["median_s"] / base["median_s"]
+        flag = "❌" if ratio > 1 + threshold else "✅"
+        print(f"{flag} {name:<34} {_fmt(base['median_s']):>10} -> {_fmt(r['median_s']):>10} ({ratio:.2f}x)")
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+
+def _fmt(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds * 1e9:.0f} ns"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the parse / estimate / predict / dose hot paths.")
+    parser.add_argument("only", nargs="*", help="run only benchmarks whose name contains one of these")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--no-compare", action="store_true", help="only report timings, even if there is no baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--quick", action="store_true", help="10x fewer iterations")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only, scale=0.1 if args.quick else 1.0)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "node": platform.node(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results saved: {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Baseline saved: {args.baseline}")
+    elif args.no_compare:
+        pass
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions")
+    else:
+        # A missing baseline must not pass as "no regressions"
+        print(f"❌ No baseline at {args.baseline}; run with --save-baseline to create one, or pass --no-compare.")
+        sys.exit(2)
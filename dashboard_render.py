@@ -0,0 +1,42 @@
+# dashboard_render.py
+
+
+class Panel:
+    """
+    One st.empty() placeholder that is only redrawn when its content changes.
+
+    Callers pass a key built from the values *as displayed* (formatted strings,
+    rounded numbers), so changes below the display precision never trigger a
+    redraw. Each redraw replaces the placeholder's elements and is re-sent to
+    the browser, so skipping unchanged frames saves server and client work.
+    """
+
+    __slots__ = ("placeholder", "_key", "redraws", "skips")
+
+    def __init__(self, placeholder):
+        self.placeholder = placeholder
+        self._key = None
+        self.redraws = 0
+        self.skips = 0
+
+    def markdown(self, html):
+        """Show an HTML/markdown string; the string itself is the key."""
+        return self.draw(html, lambda: self.placeholder.markdown(html, unsafe_allow_html=True), container=False)
+
+    def draw(self, key, render, container=True):
+        """Call render() (inside the placeholder's container) if key differs from the last draw."""
+        if key == self._key:
+            self.skips += 1
+            return False
+        if container:
+            with self.placeholder.container():
+                render()
+        else:
+            render()
+        self._key = key
+        self.redraws += 1
+        return True
+
+    def invalidate(self):
+        self._key = None
+
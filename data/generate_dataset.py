@@ -0,0 +1,160 @@
+# generate_dataset.py
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+ANCHORS_PATH = os.path.join(BASE, "hydro_data.csv")
+
+# Run as `python data/generate_dataset.py`: make the repo's modules importable
+sys.path.insert(0, os.path.dirname(BASE))
+from dataset import COLUMNS, load_dataset  # noqa: E402
+
+# How strongly N/P/K demand follows the growing conditions around each anchor:
+# relative change per unit of relative light change, and per °C away from the anchor.
+LIGHT_RESPONSE = np.array([0.35, 0.25, 0.30])
+TEMP_RESPONSE = np.array([0.02, 0.015, 0.025])
+AGE_RESPONSE = np.array([0.10, 0.05, 0.15])
+
+
+def load_anchors(path=ANCHORS_PATH):
+    """
+    The handwritten plant/stage rows every synthetic row is drawn around.
+    Read through dataset.load_dataset, so header variants and column order are
+    mapped by name and a file missing a column raises ValueError.
+    """
+    return load_dataset(path, cache=False)
+
+
+def generate_chunk(anchors, n, rng, noise=0.05, temp_sd=1.5, humidity_sd=4.0, light_sd=0.15, age_sd=0.2):
+    """
+    Draw n rows around randomly chosen anchors.
+    Conditions are jittered around the anchor, N/P/K follow them through a linear
+    response and then get multiplicative noise of relative size `noise`.
+    """
+    idx = rng.integers(0, len(anchors), n)
+    base = anchors["values"][idx]  # (n, 7): temperature, humidity, light, age, N, P, K
+
+    d_temp = rng.normal(0.0, temp_sd, n)
+    light_ratio = rng.lognormal(0.0, light_sd, n)
+    age_ratio = np.clip(rng.normal(1.0, age_sd, n), 0.3, None)
+
+    temperature = np.round(base[:, 0] + d_temp, 1)
+    humidity = np.clip(np.round(base[:, 1] + rng.normal(0.0, humidity_sd, n)), 30, 98)
+    light = np.round(base[:, 2] * light_ratio)
+    age = np.maximum(np.round(base[:, 3] * age_ratio), 1)
+
+    response = (
+        1.0
+        + LIGHT_RESPONSE * (light_ratio - 1.0)[:, None]
+        + TEMP_RESPONSE * d_temp[:, None]
+        + AGE_RESPONSE * (age_ratio - 1.0)[:, None]
+    )
+    npk = base[:, 4:] * response * rng.lognormal(0.0, noise, (n, 3))
+    npk = np.round(np.maximum(npk, 1.0), 1)
+
+    return pd.DataFrame({
+        "plant": pd.Categorical.from_codes(anchors["plant"][idx], anchors["plants"]),
+        "stage": pd.Categorical.from_codes(anchors["stage"][idx], anchors["stages"]),
+        "temperature": temperature,
+        "humidity": humidity.astype(np.int64),
+        "light_lux": light.astype(np.int64),
+        "age_days": age.astype(np.int64),
+        "N": npk[:, 0],
+        "P": npk[:, 1],
+        "K": npk[:, 2],
+    })
+
+
+def _encode_anchors(df):
+    plants = pd.Categorical(df["plant"])
+    stages = pd.Categorical(df["stage"])
+    return {
+        "plant": plants.codes,
+        "stage": stages.codes,
+        "plants": plants.categories,
+        "stages": stages.categories,
+        "values": df[COLUMNS[2:]].to_numpy(dtype=np.float64),
+    }
+
+
+class _ParquetSink:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self._pa, self._pq, self._path = pa, pq, path
+        self._writer = None
+
+    def write(self, chunk):
+        table = self._pa.Table.from_pandas(chunk, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class _CsvSink:
+    def __init__(self, path):
+        self._f = open(path, "w", encoding="utf-8", newline="")
+        self._header = True
+
+    def write(self, chunk):
+        chunk.to_csv(self._f, index=False, header=self._header)
+        self._header = False
+
+    def close(self):
+        self._f.close()
+
+
+def generate(out, rows, chunk_size=250_000, noise=0.05, seed=42, anchors_path=ANCHORS_PATH, fmt=None):
+    """
+    Write `rows` synthetic rows to `out` (CSV or Parquet) one chunk at a time,
+    so memory stays at roughly one chunk regardless of the total size.
+    """
+    fmt = fmt or ("parquet" if out.endswith((".parquet", ".pq")) else "csv")
+    anchors = _encode_anchors(load_anchors(anchors_path))
+    rng = np.random.default_rng(seed)
+    tmp = out + ".tmp"
+    sink = _ParquetSink(tmp) if fmt == "parquet" else _CsvSink(tmp)
+    try:
+        try:
+            written = 0
+            while written < rows:
+                n = min(chunk_size, rows - written)
+                sink.write(generate_chunk(anchors, n, rng, noise=noise))
+                written += n
+        finally:
+            sink.close()
+        os.replace(tmp, out)
+    except BaseException:
+        # No partial output left behind (including on Ctrl+C)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a large synthetic NPK dataset around the hand-written rows.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--out", default=os.path.join(BASE, "hydro_data_synthetic.csv"),
+                        help=".csv or .parquet (Parquet needs pyarrow)")
+    parser.add_argument("--chunk-size", type=int, default=250_000)
+    parser.add_argument("--noise", type=float, default=0.05, help="relative noise on N/P/K")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchors", default=ANCHORS_PATH)
+    args = parser.parse_args()
+
+    t = time.perf_counter()
+    n = generate(args.out, args.rows, args.chunk_size, args.noise, args.seed, args.anchors)
+    print(f"✅ Wrote {n} rows to {args.out} in {time.perf_counter() - t:.1f}s")
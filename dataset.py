@@ -0,0 +1,181 @@
+# dataset.py
+import codecs
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE, "data", "hydro_data.csv")
+CACHE_DIR = os.path.join(BASE, "data", "cache")
+
+COLUMNS = ["plant", "stage", "temperature", "humidity", "light_lux", "age_days", "N", "P", "K"]
+CATEGORICAL = ["plant", "stage"]
+
+# Normalized header -> canonical column. Headers are lowercased, with any
+# "(unit)" suffix dropped and spaces turned into underscores first.
+ALIASES = {
+    "plant": "plant",
+    "plant_type": "plant",
+    "stage": "stage",
+    "growth_stage": "stage",
+    "temperature": "temperature",
+    "temp": "temperature",
+    "humidity": "humidity",
+    "light": "light_lux",
+    "light_lux": "light_lux",
+    "lux": "light_lux",
+    "age": "age_days",
+    "age_days": "age_days",
+    "n": "N",
+    "p": "P",
+    "k": "K",
+}
+
+# Tried in order; latin-1 accepts any byte sequence so detection always succeeds.
+ENCODINGS = ("utf-8-sig", "cp1252", "latin-1")
+
+
+def detect_encoding(path, chunk_size=1 << 20):
+    """Return the first of ENCODINGS that decodes the whole file, streaming it once per candidate."""
+    for encoding in ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    decoder.decode(chunk)
+                decoder.decode(b"", final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return ENCODINGS[-1]
+
+
+def normalize_columns(df):
+    """Rename known header variants to COLUMNS and type plant/stage as categoricals."""
+    rename = {}
+    for col in df.columns:
+        key = re.sub(r"\s*\(.*\)\s*$", "", str(col)).strip().lower().replace(" ", "_")
+        if key in ALIASES:
+            rename[col] = ALIASES[key]
+    df = df.rename(columns=rename)
+    missing = [c for c in COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Dataset is missing columns {missing} (found {list(df.columns)})")
+    df = df[COLUMNS]
+    for c in CATEGORICAL:
+        df[c] = df[c].astype(str).str.strip().astype("category")
+    return df
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def cache_path(path):
+    """Columnar cache for a source CSV: a Parquet file with pyarrow, else a directory of .npy columns."""
+    source = os.path.abspath(path)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    tag = hashlib.sha1(source.encode()).hexdigest()[:8]
+    ext = ".parquet" if _has_pyarrow() else ".npy.d"
+    return os.path.join(CACHE_DIR, f"{stem}-{tag}{ext}")
+
+
+def _write_npy_columns(df, out):
+    """
+    One .npy per column (categoricals as codes plus a categories file), swapped
+    in as a directory so readers never see a partial cache.
+    """
+    parent = os.path.dirname(out)
+    tmp = tempfile.mkdtemp(prefix=".npy_cache.", dir=parent)
+    os.chmod(tmp, 0o755)  # mkdtemp is 0700; other users read the cache too
+    for c in df.columns:
+        col = df[c]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(tmp, f"{c}.npy"), col.cat.codes.to_numpy())
+            np.save(os.path.join(tmp, f"{c}.categories.npy"), col.cat.categories.to_numpy(dtype=str))
+        elif col.dtype == object:
+            np.save(os.path.join(tmp, f"{c}.npy"), col.to_numpy(dtype=str))
+        else:
+            np.save(os.path.join(tmp, f"{c}.npy"), col.to_numpy())
+    if os.path.isdir(out):
+        old = tempfile.mkdtemp(prefix=".npy_cache.old.", dir=parent)
+        os.replace(out, os.path.join(old, "cache"))
+        os.replace(tmp, out)
+        shutil.rmtree(old)
+    else:
+        os.replace(tmp, out)
+
+
+def _read_npy_columns(out, columns):
+    """Read only the requested columns back from _write_npy_columns output."""
+    data = {}
+    for c in columns:
+        values = np.load(os.path.join(out, f"{c}.npy"))
+        categories = os.path.join(out, f"{c}.categories.npy")
+        if os.path.exists(categories):
+            data[c] = pd.Categorical.from_codes(values, np.load(categories).astype(object))
+        else:
+            data[c] = values.astype(object) if values.dtype.kind == "U" else values
+    return pd.DataFrame(data)
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def build_cache(path=DATA_PATH):
+    """Parse the CSV once (single encoding pass) and write the typed columnar cache."""
+    encoding = detect_encoding(path)
+    df = normalize_columns(pd.read_csv(path, encoding=encoding))
+    out = cache_path(path)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    if out.endswith(".parquet"):
+        tmp = out + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, out)
+    else:
+        _write_npy_columns(df, out)
+    with open(out + ".json", "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(path), "encoding": encoding, **_source_stamp(path)}, f)
+    return df
+
+
+def _cache_fresh(path, out):
+    try:
+        with open(out + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    stamp = _source_stamp(path)
+    return os.path.exists(out) and all(meta.get(k) == v for k, v in stamp.items())
+
+
+def load_dataset(path=DATA_PATH, columns=None, cache=True):
+    """
+    Load the training dataset with canonical columns and categorical plant/stage.
+    Reads from the columnar cache, rebuilding it only when the CSV's size or
+    mtime changed. `columns` projects to a subset; only those columns are read
+    from disk (Parquet columns, or .npy files without pyarrow).
+    """
+    if not cache:
+        df = normalize_columns(pd.read_csv(path, encoding=detect_encoding(path)))
+        return df[columns] if columns is not None else df
+
+    out = cache_path(path)
+    if not _cache_fresh(path, out):
+        df = build_cache(path)
+        return df[columns] if columns is not None else df
+    if out.endswith(".parquet"):
+        return pd.read_parquet(out, columns=columns)
+    return _read_npy_columns(out, columns if columns is not None else COLUMNS)
@@ -0,0 +1,131 @@
+# dosing.py
+import argparse
+import re
+
+import numpy as np
+
+# NPK 19-19-19: each gram per litre provides 190 mg/L of N, P and K
+MG_PER_GRAM = 190
+
+# Fertilizer grades as a formulation matrix: row = grade, columns = mg/L of N, P, K
+# supplied per g/L (label percent * 10, the same convention as MG_PER_GRAM).
+GRADES = ("19-19-19", "20-20-20", "20-10-20", "10-52-10", "13-0-45", "15-5-15")
+
+
+def grade_vector(grade):
+    """'20-10-20' -> array([200., 100., 200.]) mg/L per g/L."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)-(\d+(?:\.\d+)?)-(\d+(?:\.\d+)?)\s*", grade)
+    if m is None:
+        raise ValueError(f"Fertilizer grade must look like '19-19-19', got {grade!r}")
+    return np.array([float(v) * 10 for v in m.groups()])
+
+
+FORMULATIONS = np.stack([grade_vector(g) for g in GRADES])
+GRADE_INDEX = {g: i for i, g in enumerate(GRADES)}
+
+
+def compute_dose(pred_npk, tds, water_liters=1.0):
+    """
+    Fertilizer needed to bring a tank from its TDS reading up to the predicted N/P/K targets.
+    Current N/P/K is approximated by splitting TDS in the target ratio.
+    """
+    pred_N, pred_P, pred_K = pred_npk
+
+    # Calculate current NPK from TDS (simple approximation)
+    # Assuming TDS roughly represents total dissolved nutrients
+    total_pred = pred_N + pred_P + pred_K
+    current_N = (pred_N / total_pred) * tds
+    current_P = (pred_P / total_pred) * tds
+    current_K = (pred_K / total_pred) * tds
+
+    # Calculate deficiencies
+    deficit_N = max(0, pred_N - current_N)
+    deficit_P = max(0, pred_P - current_P)
+    deficit_K = max(0, pred_K - current_K)
+
+    # Find the limiting nutrient
+    grams_for_N = (deficit_N / MG_PER_GRAM) if deficit_N > 0 else 0
+    grams_for_P = (deficit_P / MG_PER_GRAM) if deficit_P > 0 else 0
+    grams_for_K = (deficit_K / MG_PER_GRAM) if deficit_K > 0 else 0
+
+    # Use the maximum to ensure all needs are met
+    grams_needed = max(grams_for_N, grams_for_P, grams_for_K)
+
+    return {
+        "current": (current_N, current_P, current_K),
+        "deficit": (deficit_N, deficit_P, deficit_K),
+        "grams_per_liter": grams_needed,
+        "total_grams": grams_needed * water_liters,
+    }
+
+
+def _formulation_rows(grade, n):
+    """Per-tank (n, 3) supply rows from a grade name, index array, name list or raw vector."""
+    if isinstance(grade, str):
+        row = FORMULATIONS[GRADE_INDEX[grade]] if grade in GRADE_INDEX else grade_vector(grade)
+        return np.broadcast_to(row, (n, 3))
+    grade = np.asarray(grade)
+    if grade.dtype.kind in "iu":
+        return FORMULATIONS[grade]
+    if grade.dtype.kind in "US":
+        matrix = np.stack([grade_vector(g) for g in np.unique(grade)])
+        _, inverse = np.unique(grade, return_inverse=True)
+        return matrix[inverse]
+    return np.broadcast_to(grade.astype(np.float64), (n, 3))
+
+
+def compute_doses(pred_npk, tds, water_liters=1.0, grade="19-19-19"):
+    """
+    compute_dose for many tanks in one NumPy pass.
+    pred_npk: (n, 3) targets in mg/L; tds, water_liters: (n,) or scalars.
+    grade: one grade for every tank ('19-19-19', any 'N-P-K' string, or a
+    (3,) supply vector), or per tank an index into FORMULATIONS / array of grades.
+    Returns arrays: current and deficit (n, 3), grams_per_liter and total_grams (n,),
+    and unmet (n, 3), true where a deficit exists that the grade cannot supply.
+    """
+    pred = np.atleast_2d(np.asarray(pred_npk, dtype=np.float64))
+    n = len(pred)
+    tds = np.broadcast_to(np.asarray(tds, dtype=np.float64), (n,))
+    water = np.broadcast_to(np.asarray(water_liters, dtype=np.float64), (n,))
+    supply = _formulation_rows(grade, n)
+
+    total = pred.sum(axis=1, keepdims=True)
+    share = np.divide(pred, total, out=np.zeros_like(pred), where=total != 0)
+    current = share * tds[:, None]
+    deficit = np.maximum(pred - current, 0.0)
+
+    # Grams of this grade needed per nutrient; the limiting one sets the dose.
+    supplied = supply > 0
+    grams = np.divide(deficit, supply, out=np.zeros_like(deficit), where=supplied)
+    grams_per_liter = grams.max(axis=1)
+    return {
+        "current": current,
+        "deficit": deficit,
+        "grams_per_liter": grams_per_liter,
+        "total_grams": grams_per_liter * water,
+        "unmet": (deficit > 0) & ~supplied,
+    }
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Dosing sheet for many tanks at once.")
+    parser.add_argument("readings", help="CSV with tank, tds, N, P, K (targets) and volume_l columns; optional grade")
+    parser.add_argument("--grade", default="19-19-19", help="fertilizer grade when the CSV has no grade column")
+    parser.add_argument("--out", default="dosing_sheet.csv")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.readings)
+    grade = df["grade"].astype(str).to_numpy() if "grade" in df.columns else args.grade
+    dose = compute_doses(df[["N", "P", "K"]].to_numpy(), df["tds"].to_numpy(), df["volume_l"].to_numpy(), grade)
+
+    sheet = pd.DataFrame({"tank": df["tank"]})
+    for j, nutrient in enumerate("NPK"):
+        sheet[f"current_{nutrient}"] = dose["current"][:, j].round(2)
+        sheet[f"deficit_{nutrient}"] = dose["deficit"][:, j].round(2)
+    sheet["grams_per_liter"] = dose["grams_per_liter"].round(3)
+    sheet["total_grams"] = dose["total_grams"].round(2)
+    sheet["unmet"] = ["".join(n for n, u in zip("NPK", row) if u) for row in dose["unmet"]]
+    sheet.to_csv(args.out, index=False)
+    print(f"✅ Dosing sheet for {len(sheet)} tanks saved: {args.out} ({sheet['total_grams'].sum():.1f} g total)")
@@ -1,15 +1,130 @@
 # estimate_npk.py
-import pandas as pd
+import csv
 import os
+import threading
 
 BASE = os.path.dirname(os.path.abspath(__file__))
 RATIOS_PATH = os.path.join(BASE, "models", "npk_ratios.csv")
 
-if os.path.exists(RATIOS_PATH):
-    ratios = pd.read_csv(RATIOS_PATH)
-else:
-    # fallback empty df
-    ratios = pd.DataFrame(columns=["plant","stage","rN","rP","rK"])
+def _ratios_from_dataset():
+    """Per plant/stage mean N/P/K shares straight from the dataset cache (no trained model yet)."""
+    import pandas as pd
+    from dataset import load_dataset
+    df = load_dataset(columns=["plant", "stage", "N", "P", "K"])
+    total = df["N"] + df["P"] + df["K"]
+    shares = pd.DataFrame({
+        "plant": df["plant"].astype(str),
+        "stage": df["stage"].astype(str),
+        "rN": df["N"] / total,
+        "rP": df["P"] / total,
+        "rK": df["K"] / total,
+    })
+    means = shares.groupby(["plant", "stage"])[["rN", "rP", "rK"]].mean().reset_index()
+    return list(means.itertuples(index=False, name=None))
+
+
+def _read_ratios(path=RATIOS_PATH):
+    """Rows of (plant, stage, rN, rP, rK) from npk_ratios.csv (plain csv, no pandas)."""
+    with open(path, newline="") as f:
+        return [
+            (row["plant"], row["stage"], row["rN"], row["rP"], row["rK"])
+            for row in csv.DictReader(f)
+        ]
+
+
+RATIO_COLUMNS = ["plant", "stage", "rN", "rP", "rK"]
+
+_LAZY = ("ratios", "RATIO_ROWS", "RATIO_INDEX", "DEFAULT_RATIO", "PLANTS", "STAGES",
+         "PLANT_CODES", "STAGE_CODES", "RATIO_TABLE")
+_tables = None
+_tables_lock = threading.Lock()
+
+
+def _load_tables():
+    """Ratio lookups, built on first use (importing this module reads no files)."""
+    if os.path.exists(RATIOS_PATH):
+        ratios = _read_ratios()
+    else:
+        try:
+            ratios = _ratios_from_dataset()
+        except (OSError, ValueError, ImportError):
+            # fallback: no ratios
+            ratios = []
+
+    # Index built once: (plant, stage) -> (rN, rP, rK)
+    index = {
+        (p, s): (float(n), float(ph), float(k))
+        for p, s, n, ph, k in ratios
+    }
+
+    if index:
+        # fallback to global mean ratios
+        default = tuple(sum(r[i] for r in index.values()) / len(index) for i in range(3))
+    else:
+        # uniform split if nothing else
+        default = (0.5, 0.25, 0.25)
+
+    # Integer codes for the batch API
+    plants = sorted({p for p, _ in index})
+    stages = sorted({s for _, s in index})
+    return {
+        "RATIO_ROWS": [(p, s, float(n), float(ph), float(k)) for p, s, n, ph, k in ratios],
+        "RATIO_INDEX": index,
+        "DEFAULT_RATIO": default,
+        "PLANTS": plants,
+        "STAGES": stages,
+        "PLANT_CODES": {p: i for i, p in enumerate(plants)},
+        "STAGE_CODES": {s: i for i, s in enumerate(stages)},
+    }
+
+
+def _ratio_table(tables):
+    # Dense (plant, stage, 3) table; the extra last row/column holds the default
+    # ratio so code -1 (unknown) and unseen pairs fall back without branching.
+    import numpy as np
+    table = np.empty((len(tables["PLANTS"]) + 1, len(tables["STAGES"]) + 1, 3))
+    table[:] = tables["DEFAULT_RATIO"]
+    for (p, s), r in tables["RATIO_INDEX"].items():
+        table[tables["PLANT_CODES"][p], tables["STAGE_CODES"][s]] = r
+    return table
+
+
+def _ratio_frame(tables):
+    # The ratios as a DataFrame (RATIO_COLUMNS), as this module exposed them before
+    # the table became lazy; RATIO_ROWS holds the same data without pandas.
+    import pandas as pd
+    return pd.DataFrame(tables["RATIO_ROWS"], columns=RATIO_COLUMNS)
+
+
+# Derived tables that need numpy/pandas are only built when asked for.
+_DERIVED = {"RATIO_TABLE": _ratio_table, "ratios": _ratio_frame}
+
+
+def _get(name):
+    global _tables
+    if _tables is None or name not in _tables:
+        with _tables_lock:
+            if _tables is None:
+                _tables = _load_tables()
+            if name in _DERIVED and name not in _tables:
+                _tables[name] = _DERIVED[name](_tables)
+    return _tables[name]
+
+
+def __getattr__(name):
+    # Module attributes ratios (DataFrame), RATIO_ROWS, RATIO_INDEX, PLANTS, RATIO_TABLE, ... resolve lazily
+    if name in _LAZY:
+        return _get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def plant_stages():
+    """{plant: [stages]} for every pair in the ratios table."""
+    out = {}
+    for p, s in sorted(_get("RATIO_INDEX")):
+        out.setdefault(p, []).append(s)
+    return out
+
 
 def estimate_npk_from_tds(tds_ppm, plant, stage, scale=1.0):
     """
@@ -19,21 +134,28 @@ def estimate_npk_from_tds(tds_ppm, plant, stage, scale=1.0):
     # handle missing/zero tds
     if tds_ppm is None:
         return 0.0, 0.0, 0.0
-    # find ratio row
-    row = ratios[(ratios["plant"] == plant) & (ratios["stage"] == stage)]
-    if not row.empty:
-        rN = float(row.iloc[0]["rN"])
-        rP = float(row.iloc[0]["rP"])
-        rK = float(row.iloc[0]["rK"])
-    else:
-        # fallback to global mean ratios
-        if not ratios.empty:
-            rN = ratios["rN"].mean()
-            rP = ratios["rP"].mean()
-            rK = ratios["rK"].mean()
-        else:
-            # uniform split if nothing else
-            rN, rP, rK = 0.5, 0.25, 0.25
+    rN, rP, rK = _get("RATIO_INDEX").get((plant, stage), _get("DEFAULT_RATIO"))
 
     total_est = tds_ppm * scale
     return round(total_est * rN, 2), round(total_est * rP, 2), round(total_est * rK, 2)
+
+
+def encode_plant_stage(plants, stages):
+    """Map plant and stage names to integer codes for estimate_npk_batch (-1 = unknown)."""
+    import numpy as np
+    plant_index, stage_index = _get("PLANT_CODES"), _get("STAGE_CODES")
+    plant_codes = np.fromiter((plant_index.get(p, -1) for p in plants), dtype=np.intp)
+    stage_codes = np.fromiter((stage_index.get(s, -1) for s in stages), dtype=np.intp)
+    return plant_codes, stage_codes
+
+
+def estimate_npk_batch(tds_ppm, plant_codes, stage_codes, scale=1.0):
+    """
+    Vectorized estimate_npk_from_tds.
+    Takes arrays of TDS values and plant/stage codes, returns an (N, 3) array of N, P, K.
+    Codes are indices into PLANTS / STAGES; -1 means unknown (global mean ratios).
+    """
+    import numpy as np
+    tds = np.asarray(tds_ppm, dtype=np.float64) * scale
+    r = _get("RATIO_TABLE")[np.asarray(plant_codes), np.asarray(stage_codes)]
+    return np.round(r * tds[:, None], 2)
@@ -0,0 +1,324 @@
+# forest_compiler.py
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE, "models", "npk_model.pkl")
+# Directory of plain .npy files so the node arrays can be memory-mapped
+FOREST_PATH = os.path.join(BASE, "models", "npk_forest")
+
+INPUT_COLUMNS = ["plant", "stage", "temperature", "humidity", "light_lux", "age_days"]
+
+
+class FlatForest:
+    """
+    Pure-NumPy predictor for the trained NPK pipeline.
+    All trees of all outputs are flattened into contiguous node arrays; leaves
+    point to themselves so a batch walks every tree in lockstep until all land.
+    """
+
+    max_specialized = 16
+    specialize_after = 64
+    # sklearn costs ~120 ms per call but ~4x less per row than the NumPy walk,
+    # so from about this many rows the pickled pipeline is faster.
+    pipeline_rows = 256
+
+    def __init__(self, arrays, pipeline_path=None):
+        self.arrays = arrays
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]  # (n_outputs, n_trees)
+        self.max_depth = int(arrays["max_depth"])
+        self.onehot_columns = [str(c) for c in arrays["onehot_columns"]]
+        self.categories = [
+            {str(c): i for i, c in enumerate(arrays[f"categories_{j}"])}
+            for j in range(len(self.onehot_columns))
+        ]
+        self.numeric_columns = [str(c) for c in arrays["numeric_columns"]]
+        self.n_features = sum(len(c) for c in self.categories) + len(self.numeric_columns)
+        self._specialized = {}
+        self._pair_rows = {}
+        self._lock = threading.Lock()
+        self.pipeline_path = pipeline_path
+        self._pipeline = None
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Flatten a fitted Pipeline(ColumnTransformer(OneHotEncoder + passthrough), MultiOutputRegressor(forest))."""
+        pre, reg = pipeline.steps[0][1], pipeline.steps[-1][1]
+
+        onehot_columns, categories, numeric_columns = [], [], []
+        for name, trans, cols in pre.transformers_:
+            if hasattr(trans, "categories_"):
+                if getattr(trans, "drop_idx_", None) is not None:
+                    raise ValueError("OneHotEncoder with drop= is not supported")
+                for col, cats in zip(cols, trans.categories_):
+                    onehot_columns.append(col)
+                    categories.append(np.asarray(cats, dtype=str))
+            elif trans == "drop":
+                continue
+            elif trans == "passthrough" or getattr(trans, "func", "x") is None:
+                numeric_columns.extend(pre.feature_names_in_[c] if isinstance(c, (int, np.integer)) else c
+                                       for c in cols)
+            else:
+                raise ValueError(f"Unsupported transformer in pipeline: {name}")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for est in reg.estimators_:
+            output_roots = []
+            for tree in est.estimators_:
+                t = tree.tree_
+                n = t.node_count
+                leaf = t.children_left == -1
+                own = np.arange(n)
+                features.append(np.where(leaf, 0, t.feature))
+                thresholds.append(np.where(leaf, np.inf, t.threshold))
+                lefts.append(np.where(leaf, own, t.children_left) + offset)
+                rights.append(np.where(leaf, own, t.children_right) + offset)
+                values.append(t.value[:, 0, 0])
+                output_roots.append(offset)
+                offset += n
+                max_depth = max(max_depth, t.max_depth)
+            roots.append(output_roots)
+
+        arrays = {
+            "feature": np.concatenate(features).astype(np.int32),
+            "threshold": np.concatenate(thresholds).astype(np.float64),
+            "children": np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1).astype(np.int32),
+            "value": np.concatenate(values).astype(np.float64),
+            "roots": np.asarray(roots, dtype=np.int32),
+            "max_depth": np.int32(max_depth),
+            "onehot_columns": np.asarray(onehot_columns, dtype=str),
+            "numeric_columns": np.asarray(numeric_columns, dtype=str),
+        }
+        for j, cats in enumerate(categories):
+            arrays[f"categories_{j}"] = cats
+        return cls(arrays)
+
+    @classmethod
+    def load(cls, path=FOREST_PATH, mmap_mode="r", pipeline_path=None):
+        """
+        Open a saved forest. With mmap_mode="r" the node arrays are mapped read-only,
+        so loading is near-instant and processes share one page-cache copy.
+        With pipeline_path (the .pkl the forest was exported from), predict() hands
+        batches of pipeline_rows or more to sklearn, loading it on first use.
+        """
+        if path.endswith(".npz"):
+            with np.load(path) as data:
+                return cls({k: data[k] for k in data.files}, pipeline_path)
+        arrays = {
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+        return cls(arrays, pipeline_path)
+
+    def save(self, path=FOREST_PATH):
+        """Write one .npy per array, swapping the directory in so readers never see a partial forest."""
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".npk_forest.", dir=parent)
+        os.chmod(tmp, 0o755)  # mkdtemp is 0700; the dashboard/server may run as another user
+        for name, arr in self.arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.asarray(arr))
+        if os.path.isdir(path):
+            old = tempfile.mkdtemp(prefix=".npk_forest.old.", dir=parent)
+            os.replace(path, os.path.join(old, "forest"))
+            os.replace(tmp, path)
+            shutil.rmtree(old)  # processes that mapped the old files keep them until they exit
+        else:
+            os.replace(tmp, path)
+
+    def encode(self, columns):
+        """Build the float32 feature matrix from {column: sequence} (same layout as the pipeline)."""
+        n = len(columns[self.numeric_columns[0]]) if self.numeric_columns else len(columns[self.onehot_columns[0]])
+        X = np.zeros((n, self.n_features), dtype=np.float32)
+        rows = np.arange(n)
+        pos = 0
+        for col, index in zip(self.onehot_columns, self.categories):
+            codes = np.fromiter((index.get(v, -1) for v in columns[col]), dtype=np.intp, count=n)
+            known = codes >= 0
+            X[rows[known], pos + codes[known]] = 1.0  # unknown -> all zeros, like handle_unknown="ignore"
+            pos += len(index)
+        for col in self.numeric_columns:
+            X[:, pos] = np.asarray(columns[col], dtype=np.float64)
+            pos += 1
+        return X
+
+    def _specialize(self, onehot, n_rows):
+        """
+        Collapse every one-hot split for a fixed category vector (one plant/stage pair).
+        Returns (roots, flat children) that only branch on numeric features, which
+        roughly halves the walk depth. Building one costs about as much as walking
+        a few dozen rows, so a pair is only specialized once it has seen
+        specialize_after rows; results are kept in a small LRU.
+        """
+        key = onehot.tobytes()
+        with self._lock:
+            return self._specialize_locked(key, onehot, n_rows)
+
+    def _specialize_locked(self, key, onehot, n_rows):
+        cached = self._specialized.pop(key, None)
+        if cached is None:
+            seen = self._pair_rows.get(key, 0) + n_rows
+            self._pair_rows[key] = seen
+            if seen < self.specialize_after:
+                return self.roots.ravel(), self.children.ravel()
+            own = np.arange(len(self.feature), dtype=np.int32)
+            leaf = self.children[:, 0] == own
+            cat = ~leaf & (self.feature < len(onehot))
+            jump = own.copy()
+            go_right = onehot[self.feature[cat]] > self.threshold[cat]
+            jump[cat] = self.children[cat, go_right.astype(np.intp)]
+            # Pointer doubling: after k rounds each node skips 2**k decided splits.
+            for _ in range(self.max_depth.bit_length()):
+                jump = jump[jump]
+            cached = (jump[self.roots.ravel()], jump[self.children].ravel())
+            if len(self._specialized) >= self.max_specialized:
+                self._specialized.pop(next(iter(self._specialized)))
+        self._specialized[key] = cached
+        return cached
+
+    def _walk(self, X, roots, children):
+        """Walk every (row, tree) pair to its leaf, dropping pairs as they land."""
+        n, n_features = X.shape
+        n_outputs, n_trees = self.roots.shape
+        xf = X.ravel()
+        node = np.tile(roots, n)
+        pos = np.arange(node.size)
+        cur = node
+        offset = np.repeat(np.arange(n, dtype=np.int32) * n_features, roots.size)
+        while pos.size:
+            # sklearn compares float32 inputs against float64 thresholds
+            new = children[2 * cur + (xf[offset + self.feature[cur]] > self.threshold[cur])]
+            moved = new != cur
+            node[pos] = new
+            pos, cur, offset = pos[moved], new[moved], offset[moved]
+        return self.value[node].reshape(n, n_outputs, n_trees).sum(axis=2) / n_trees
+
+    def predict_encoded(self, X, chunk_size=2048):
+        """Predict from an encoded (n, n_features) matrix. Returns (n, n_outputs)."""
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty((len(X), self.roots.shape[0]))
+        n_onehot = self.n_features - len(self.numeric_columns)
+        # One mixed-radix code per row identifies its category combination.
+        codes = np.zeros(len(X), dtype=np.int64)
+        pos = 0
+        for index in self.categories:
+            block = X[:, pos:pos + len(index)]
+            codes = codes * (len(index) + 1) + np.where(block.any(axis=1), block.argmax(axis=1), len(index))
+            pos += len(index)
+        keys, group = np.unique(codes, return_inverse=True)
+        for g in range(len(keys)):
+            rows = np.flatnonzero(group == g) if len(keys) > 1 else np.arange(len(X))
+            onehot = X[rows[0], :n_onehot]
+            roots, children = self._specialize(onehot, len(rows))
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                out[chunk] = self._walk(X[chunk], roots, children)
+        return out
+
+    def _get_pipeline(self):
+        """The sklearn pipeline at pipeline_path, or None if there is none (loaded once)."""
+        with self._lock:
+            if self._pipeline is None and self.pipeline_path is not None:
+                import joblib  # only processes that see large batches pay for sklearn
+                try:
+                    self._pipeline = joblib.load(self.pipeline_path)
+                except OSError:
+                    self.pipeline_path = None
+            return self._pipeline
+
+    def predict(self, X):
+        """Predict from a DataFrame or {column: sequence} with the pipeline's input columns."""
+        n = len(X) if hasattr(X, "columns") else len(X[INPUT_COLUMNS[0]])
+        if n >= self.pipeline_rows and self.pipeline_path is not None:
+            pipeline = self._get_pipeline()
+            if pipeline is not None:
+                import pandas as pd
+                frame = X if hasattr(X, "columns") else pd.DataFrame({c: X[c] for c in INPUT_COLUMNS})
+                return np.asarray(pipeline.predict(frame[INPUT_COLUMNS]))
+        if hasattr(X, "columns"):
+            X = {col: X[col].to_numpy() for col in X.columns}
+        return self.predict_encoded(self.encode(X))
+
+    def predict_one(self, plant, stage, temperature, light_lux, humidity=65, age_days=30):
+        row = {
+            "plant": [plant], "stage": [stage], "temperature": [temperature],
+            "humidity": [humidity], "light_lux": [light_lux], "age_days": [age_days],
+        }
+        return tuple(float(v) for v in self.predict_encoded(self.encode(row))[0])
+
+
+def verify(pipeline, forest, df, atol=1e-9):
+    """Compare forest against pipeline.predict on df; raise if they differ. Returns max abs diff."""
+    expected = pipeline.predict(df[INPUT_COLUMNS])
+    got = forest.predict_encoded(forest.encode({c: df[c].to_numpy() for c in INPUT_COLUMNS}))
+    diff = float(np.max(np.abs(expected - got))) if len(df) else 0.0
+    if diff > atol:
+        raise AssertionError(f"Flat forest differs from sklearn model by {diff}")
+    return diff
+
+
+def verification_frame(data_df, n_random=2000, seed=0):
+    """Training rows plus random rows spanning every plant/stage pair and the sensor ranges."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    pairs = data_df[["plant", "stage"]].drop_duplicates().to_numpy()
+    pick = pairs[rng.integers(0, len(pairs), n_random)]
+    random_rows = pd.DataFrame({
+        "plant": pick[:, 0],
+        "stage": pick[:, 1],
+        "temperature": rng.uniform(18, 32, n_random).round(1),
+        "humidity": rng.uniform(50, 90, n_random).round(),
+        "light_lux": rng.uniform(3000, 12000, n_random).round(),
+        "age_days": rng.integers(1, 90, n_random),
+    })
+    return pd.concat([data_df[INPUT_COLUMNS], random_rows], ignore_index=True)
+
+
+if __name__ == "__main__":
+    import time
+
+    import joblib
+
+    from dataset import load_dataset
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    out_path = sys.argv[2] if len(sys.argv) > 2 else FOREST_PATH
+
+    model = joblib.load(model_path)
+    forest = FlatForest.from_pipeline(model)
+    data_df = load_dataset()
+    check_df = verification_frame(data_df)
+    diff = verify(model, forest, check_df)
+    forest.save(out_path)
+    print(f"✅ Flat forest saved: {out_path} ({forest.value.size} nodes, max diff {diff:.2e})")
+
+    row = check_df.iloc[[0]]
+    t = time.perf_counter()
+    for _ in range(100):
+        model.predict(row)
+    sk_single = (time.perf_counter() - t) / 100
+    t = time.perf_counter()
+    for _ in range(100):
+        forest.predict(row)
+    flat_single = (time.perf_counter() - t) / 100
+    t = time.perf_counter()
+    model.predict(check_df)
+    sk_batch = (time.perf_counter() - t) / len(check_df)
+    X = forest.encode({c: check_df[c].to_numpy() for c in INPUT_COLUMNS})
+    t = time.perf_counter()
+    forest.predict_encoded(X)
+    flat_batch = (time.perf_counter() - t) / len(check_df)
+    print(f"Single row: sklearn {sk_single * 1e3:.2f} ms, flat {flat_single * 1e6:.0f} µs")
+    print(f"Batch of {len(check_df)}: sklearn {sk_batch * 1e6:.1f} µs/row, flat {flat_batch * 1e6:.1f} µs/row "
+          f"(predict() uses sklearn from {FlatForest.pipeline_rows} rows when given pipeline_path)")
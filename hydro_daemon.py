@@ -0,0 +1,114 @@
+# hydro_daemon.py
+"""
+Headless logger/doser for gateways: no Streamlit, pandas or sklearn.
+
+Blocks in poll() on the serial port between readings and appends one JSON line
+per reading (raw values, estimated N/P/K and, with a precomputed surface, the
+dose) to a local file. Every --report seconds, with or without readings, it logs
+its own CPU share and resident memory.
+"""
+import argparse
+import json
+import os
+import signal
+import time
+
+from dosing import compute_dose
+from estimate_npk import estimate_npk_from_tds
+from model_store import memory_kb
+from serial_reader import read_serial
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+LOG_PATH = os.path.join(BASE, "data", "daemon_log.jsonl")
+SURFACE_PATH = os.path.join(BASE, "models", "npk_surface.npz")
+
+
+class ResourceMonitor:
+    """CPU share (process time / wall time) and RSS since the previous sample."""
+
+    def __init__(self):
+        self._wall = time.monotonic()
+        self._cpu = time.process_time()
+
+    def sample(self):
+        wall, cpu = time.monotonic(), time.process_time()
+        share = (cpu - self._cpu) / max(wall - self._wall, 1e-9)
+        self._wall, self._cpu = wall, cpu
+        rss = memory_kb().get("VmRSS", 0)
+        return {"cpu_percent": round(100 * share, 3), "rss_mb": round(rss / 1024, 1)}
+
+
+def process(reading, plant, stage, water_liters=1.0, surface=None, scale=1.0):
+    """One log record: the reading plus estimated N/P/K and, with a surface, targets and dose."""
+    record = {"ts": round(time.time(), 3), **reading}
+    tds = reading.get("tds")
+    record["npk"] = estimate_npk_from_tds(tds, plant, stage, scale)
+    if surface is not None and tds is not None and "temperature" in reading and "light" in reading:
+        target = surface.lookup(plant, stage, reading["temperature"], reading["light"])
+        if target is not None:
+            dose = compute_dose(target, tds, water_liters)
+            record["target"] = [round(v, 2) for v in target]
+            record["grams_per_liter"] = round(dose["grams_per_liter"], 3)
+            record["total_grams"] = round(dose["total_grams"], 3)
+    return record
+
+
+def run(port, plant, stage, baud=9600, out=LOG_PATH, water_liters=1.0,
+        surface_path=SURFACE_PATH, report_every=60.0, reconnect_delay=5.0):
+    surface = None
+    if surface_path and os.path.exists(surface_path):
+        from npk_surface import MODEL_PATH, NPKSurface
+        try:
+            # Rejected if the model next to it has been retrained since it was built
+            surface = NPKSurface.load(surface_path, model_path=MODEL_PATH)
+        except ValueError as e:
+            print(f"⚠️ {e}; logging without doses")
+
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    monitor = ResourceMonitor()
+    next_report = time.monotonic() + report_every
+    # poll() wakes at least this often on a quiet port, so reports are at most this late
+    wake = max(0.5, min(5.0, report_every / 10))
+
+    def report_if_due(log):
+        nonlocal next_report
+        if time.monotonic() >= next_report:
+            next_report = time.monotonic() + report_every
+            log.write(json.dumps({"ts": round(time.time(), 3), "daemon": monitor.sample()}) + "\n")
+
+    with open(out, "a", buffering=1) as log:
+        while True:
+            try:
+                # Sleeps in poll(); None means `wake` seconds passed without data
+                for reading in read_serial(port, baud, timeout=wake, yield_idle=True):
+                    if reading is not None:
+                        log.write(json.dumps(process(reading, plant, stage, water_liters, surface)) + "\n")
+                    report_if_due(log)
+            except RuntimeError as e:
+                print(f"⚠️ {e}")
+            # read_serial returns when the port fails; wait for the board to come back
+            deadline = time.monotonic() + reconnect_delay
+            while time.monotonic() < deadline:
+                time.sleep(min(wake, deadline - time.monotonic()))
+                report_if_due(log)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log readings and doses without the dashboard.")
+    parser.add_argument("port", help="serial port, e.g. /dev/ttyACM0")
+    parser.add_argument("--plant", required=True)
+    parser.add_argument("--stage", required=True)
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--out", default=LOG_PATH, help="JSON-lines log file (appended)")
+    parser.add_argument("--water-liters", type=float, default=1.0)
+    parser.add_argument("--surface", default=SURFACE_PATH, help="npk_surface.npz for targets and doses ('' to skip)")
+    parser.add_argument("--report", type=float, default=60.0, help="seconds between CPU/memory records")
+    args = parser.parse_args()
+
+    # SIGTERM (systemd stop) exits through the same path as Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        run(args.port, args.plant, args.stage, args.baud, args.out, args.water_liters,
+            args.surface, args.report)
+    except KeyboardInterrupt:
+        pass
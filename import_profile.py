@@ -0,0 +1,153 @@
+# import_profile.py
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+
+# Entry point -> module to import, or a script whose top-level imports are replayed.
+ENTRY_POINTS = {
+    "dashboard": "streamlit_app.py",
+    "daemon": "hydro_daemon",
+    "predict_server": "predict_server",
+    "acquisition": "acquisition",
+    "alerts": "alerts",
+    "dosing": "dosing",
+    "estimate_npk": "estimate_npk",
+    "train_model": "train_model",
+}
+
+# `streamlit run` has imported streamlit before the script starts, so it is not part of the app's cost.
+PRELOADED = {"streamlit"}
+
+# Modules an entry point must not pull in at import time (loaded lazily on first use).
+FORBIDDEN = {
+    "dashboard": ("pandas", "sklearn", "joblib", "dataset", "http.server"),
+    "daemon": ("pandas", "sklearn", "joblib", "streamlit", "http.server"),
+    "predict_server": ("pandas", "sklearn", "joblib"),
+    "acquisition": ("pandas", "sklearn", "joblib"),
+    "alerts": ("pandas", "sklearn"),
+    "dosing": ("pandas", "sklearn"),
+    "estimate_npk": ("pandas", "numpy"),
+}
+
+# Import-time ceilings in ms (about 3x a laptop measurement; scale with --budget-scale).
+BUDGET_MS = {
+    "dashboard": 450,
+    "daemon": 420,
+    "predict_server": 550,
+    "acquisition": 550,
+    "alerts": 400,
+    "dosing": 350,
+    "estimate_npk": 60,
+}
+
+
+def import_code(target):
+    """Python source that performs the entry point's imports."""
+    if not target.endswith(".py"):
+        return f"import {target}"
+    with open(os.path.join(BASE, target), encoding="utf-8") as f:
+        tree = ast.parse(f.read(), target)
+    lines = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [a for a in node.names if a.name.split(".")[0] not in PRELOADED]
+            if names:
+                lines.append(ast.unparse(ast.Import(names=names)))
+        elif isinstance(node, ast.ImportFrom) and (node.module or "").split(".")[0] not in PRELOADED:
+            lines.append(ast.unparse(node))
+    return "\n".join(lines)
+
+
+def _run(code, python):
+    dump = "\nimport sys, json; print(json.dumps(sorted(sys.modules)))"
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", code + dump],
+        capture_output=True, text=True, cwd=BASE,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    entries = []  # (depth, name, self_us, cumulative_us)
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip(), int(self_us), int(cumulative)))
+    return entries, set(json.loads(proc.stdout.splitlines()[-1]))
+
+
+def profile(target, python=sys.executable, top=8):
+    """
+    Import cost of one entry point in a fresh interpreter (python -X importtime).
+    Returns {"total_ms", "modules", "heaviest": [(package, ms)], "loaded": set}.
+    Interpreter startup imports (site, encodings, ...) are left out.
+    """
+    startup_entries, startup_modules = _run("pass", python)
+    startup = {name for _, name, _, _ in startup_entries} | startup_modules
+    entries, loaded = _run(import_code(target), python)
+    fresh = [e for e in entries if e[1] not in startup]
+    # Outermost entries are the code's own imports; their cumulative times cover the rest
+    top_depth = min((depth for depth, *_ in fresh), default=0)
+    total = sum(cum for depth, _, _, cum in fresh if depth == top_depth)
+    packages = {}
+    for _, name, _, cum in fresh:
+        if "." not in name:
+            packages[name] = max(packages.get(name, 0), cum)
+    heaviest = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "total_ms": total / 1000,
+        "modules": len(fresh),
+        "heaviest": [(name, us / 1000) for name, us in heaviest],
+        "loaded": loaded - startup_modules,
+    }
+
+
+def check(name, result, budget_scale=1.0):
+    """Problems with one profile: forbidden modules loaded, or over the time budget."""
+    problems = [
+        f"imports {mod} at startup"
+        for mod in FORBIDDEN.get(name, ())
+        if mod in result["loaded"]
+    ]
+    budget = BUDGET_MS.get(name)
+    if budget is not None and result["total_ms"] > budget * budget_scale:
+        problems.append(f"{result['total_ms']:.0f} ms > {budget * budget_scale:.0f} ms budget")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time report for each entry point.")
+    parser.add_argument("only", nargs="*", help="entry points to profile (default: all)")
+    parser.add_argument("--check", action="store_true", help="exit 1 on forbidden imports or blown budgets")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply BUDGET_MS (slow machines)")
+    parser.add_argument("--top", type=int, default=6)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    names = args.only or list(ENTRY_POINTS)
+    results, failed = {}, False
+    for name in names:
+        try:
+            result = profile(ENTRY_POINTS[name], top=args.top)
+        except RuntimeError as e:
+            print(f"{name:<16} skipped: {e}")
+            continue
+        problems = check(name, result, args.budget_scale)
+        failed |= bool(problems)
+        heaviest = ", ".join(f"{pkg} {ms:.0f}" for pkg, ms in result["heaviest"])
+        mark = "❌" if problems else "✅"
+        print(f"{mark} {name:<16} {result['total_ms']:7.1f} ms  {result['modules']:4d} modules  ({heaviest})")
+        for problem in problems:
+            print(f"   {problem}")
+        results[name] = dict(result, loaded=sorted(result["loaded"]), problems=problems)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.check and failed:
+        sys.exit(1)
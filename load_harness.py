@@ -0,0 +1,139 @@
+# load_harness.py
+import argparse
+import asyncio
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+
+from acquisition import MultiPortReader
+from arduino_sim import Fleet, VirtualArduino
+from estimate_npk import estimate_npk_from_tds
+from serial_reader import FIELDS, read_serial
+
+
+def _npk_result(data, plant, stage, predictor):
+    """The work done per block downstream of parsing: ratio estimate, plus model targets if enabled."""
+    npk = estimate_npk_from_tds(data["tds"], plant, stage)
+    if predictor is not None:
+        predictor.predict(plant, stage, data["temperature"], data["light"])
+    return npk
+
+
+async def _consume_asyncio(sims, deadline, handle):
+    ports = {i: sim.port for i, sim in enumerate(sims)}
+    async with MultiPortReader(ports, reset_delay=0, reconnect_delay=0.5) as reader:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                data = await asyncio.wait_for(reader.queue.get(), remaining)
+            except asyncio.TimeoutError:
+                return
+            handle(data["tank"], data)
+
+
+def _consume_threads(sims, deadline, handle):
+    """One blocking read_serial generator per port, as the original code would scale."""
+    q = queue.Queue()
+
+    def pump(tank, port):
+        for data in read_serial(port):
+            q.put((tank, data))
+
+    for i, sim in enumerate(sims):
+        threading.Thread(target=pump, args=(i, sim.port), daemon=True).start()
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        try:
+            tank, data = q.get(timeout=remaining)
+        except queue.Empty:
+            return
+        handle(tank, data)
+
+
+def run(tanks, rate=1.0, duration=10.0, warmup=1.5, reader="asyncio", malformed=0.0,
+        plant="Tomato", stage="Vegetative", predictor=None, binary=False):
+    """Run one load level and return throughput / latency stats."""
+    sims = [VirtualArduino(rate=rate, malformed=malformed, seq=True, binary=binary, seed=i) for i in range(tanks)]
+    latencies = []
+    counts = {"blocks": 0, "incomplete": 0}
+
+    def handle(tank, data):
+        if not all(f in data for f in FIELDS):
+            counts["incomplete"] += 1
+            return
+        _npk_result(data, plant, stage, predictor)
+        sent = sims[tank].sent_at.pop(data.get("seq"), None)
+        if sent is None or sent < measure_from:
+            return
+        latencies.append(time.perf_counter() - sent)
+        counts["blocks"] += 1
+
+    measure_from = time.perf_counter() + warmup
+    fleet = Fleet(sims).start()
+    deadline = time.monotonic() + warmup + duration
+    try:
+        if reader == "asyncio":
+            asyncio.run(_consume_asyncio(sims, deadline, handle))
+        else:
+            _consume_threads(sims, deadline, handle)
+    finally:
+        fleet.stop()
+
+    sent = sum(sim.blocks_sent for sim in sims)
+    lat = np.array(latencies) * 1e3
+    return {
+        "tanks": tanks,
+        "reader": reader,
+        "protocol": "binary" if binary else "text",
+        "rate_hz": rate,
+        "blocks_sent": sent,
+        "blocks_measured": counts["blocks"],
+        "incomplete": counts["incomplete"],
+        "throughput_bps": counts["blocks"] / duration,
+        "latency_ms": {
+            "p50": float(np.percentile(lat, 50)) if len(lat) else None,
+            "p95": float(np.percentile(lat, 95)) if len(lat) else None,
+            "p99": float(np.percentile(lat, 99)) if len(lat) else None,
+            "max": float(lat.max()) if len(lat) else None,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end load test against simulated Arduino tanks.")
+    parser.add_argument("--tanks", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--rate", type=float, default=1.0, help="blocks per second per tank")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per level")
+    parser.add_argument("--reader", choices=["asyncio", "threads"], default="asyncio")
+    parser.add_argument("--malformed", type=float, default=0.0)
+    parser.add_argument("--binary", action="store_true", help="simulate boards sending CRC16 binary frames")
+    parser.add_argument("--targets", action="store_true", help="also compute model targets (needs models/npk_model.pkl)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    predictor = None
+    if args.targets:
+        from prediction_cache import PredictionCache
+        predictor = PredictionCache()
+
+    results = []
+    print(f"{'tanks':>6} {'blocks/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'bad':>5}")
+    for n in args.tanks:
+        r = run(n, args.rate, args.duration, reader=args.reader,
+                malformed=args.malformed, predictor=predictor, binary=args.binary)
+        results.append(r)
+        lat = {k: (f"{v:.2f}" if v is not None else "-") for k, v in r["latency_ms"].items()}
+        print(f"{n:>6} {r['throughput_bps']:>9.1f} {lat['p50']:>8} {lat['p95']:>8} "
+              f"{lat['p99']:>8} {lat['max']:>8} {r['incomplete']:>5}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved: {args.json}")
@@ -0,0 +1,217 @@
+# metrics.py
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) for stage latency histograms: 50 µs .. 10 s.
+BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Upper bounds for size histograms (batch sizes, queue depths).
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+DEFAULT_PORT = 9108
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Counters and per-stage latency histograms, rendered in Prometheus text format.
+    Every update takes one lock; an observation costs about a microsecond.
+    Optionally mirrors each stage timing to a JSON-lines trace file.
+    """
+
+    def __init__(self, prefix="hydro"):
+        self.prefix = prefix
+        self.counters = {}  # name -> value
+        self.stages = {}  # stage -> Histogram
+        self.gauges = {}  # name -> value
+        self.sizes = {}  # name -> Histogram over SIZE_BUCKETS
+        self.help = {}
+        self._lock = threading.Lock()
+        self._trace = None
+        self._server = None
+
+    def inc(self, name, n=1, help=None):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+            if help:
+                self.help[name] = help
+
+    def set(self, name, value, help=None):
+        """Set a gauge (e.g. current queue depth)."""
+        with self._lock:
+            self.gauges[name] = value
+            if help:
+                self.help[name] = help
+
+    def observe_size(self, name, value, help=None):
+        """Record a count-like value (batch size, queue depth) into a size histogram."""
+        with self._lock:
+            hist = self.sizes.get(name)
+            if hist is None:
+                hist = self.sizes[name] = Histogram(SIZE_BUCKETS)
+            hist.observe(value)
+            if help:
+                self.help[name] = help
+
+    def observe(self, stage, seconds, **fields):
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds)
+            if self._trace is not None:
+                event = {"ts": time.time(), "stage": stage, "ms": round(seconds * 1e3, 4)}
+                if fields:
+                    event.update(fields)
+                self._trace.write(json.dumps(event) + "\n")
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """Time the with-block into the `name` stage histogram."""
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t, **fields)
+
+    def stopwatch(self):
+        """Sequential stage timer for a loop body: each lap(stage) records the time since the previous lap."""
+        return Stopwatch(self)
+
+    def trace_to(self, path):
+        """Append one JSON line per stage observation to path (None stops tracing)."""
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+            self._trace = open(path, "a", buffering=1, encoding="utf-8") if path else None
+
+    def render(self):
+        p = self.prefix
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# HELP {p}_{name}_total {self.help.get(name, name.replace('_', ' '))}")
+                lines.append(f"# TYPE {p}_{name}_total counter")
+                lines.append(f"{p}_{name}_total {value}")
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f"# HELP {p}_{name} {self.help.get(name, name.replace('_', ' '))}")
+                lines.append(f"# TYPE {p}_{name} gauge")
+                lines.append(f"{p}_{name} {value}")
+            if self.stages:
+                lines.append(f"# HELP {p}_stage_seconds Time spent per pipeline stage")
+                lines.append(f"# TYPE {p}_stage_seconds histogram")
+            for stage, hist in sorted(self.stages.items()):
+                _render_histogram(lines, f"{p}_stage_seconds", hist, f'stage="{stage}"')
+            for name, hist in sorted(self.sizes.items()):
+                lines.append(f"# HELP {p}_{name} {self.help.get(name, name.replace('_', ' '))}")
+                lines.append(f"# TYPE {p}_{name} histogram")
+                _render_histogram(lines, f"{p}_{name}", hist)
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """{stage: {"count", "mean_ms"}} plus counters, for printing."""
+        with self._lock:
+            stages = {
+                s: {"count": h.count, "mean_ms": h.sum / h.count * 1e3 if h.count else 0.0}
+                for s, h in self.stages.items()
+            }
+            return {"stages": stages, "counters": dict(self.counters)}
+
+    def serve(self, port=DEFAULT_PORT, host="127.0.0.1"):
+        """Serve /metrics from a daemon thread. Idempotent; returns the server."""
+        if self._server is not None:
+            return self._server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # only when serving
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+
+def _render_histogram(lines, metric, hist, labels=""):
+    sep = "," if labels else ""
+    cumulative = 0
+    for bound, n in zip(hist.buckets + ("+Inf",), hist.counts):
+        cumulative += n
+        lines.append(f'{metric}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {hist.sum:.9f}")
+    lines.append(f"{metric}_count{suffix} {hist.count}")
+
+
+class Stopwatch:
+    __slots__ = ("registry", "_last")
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.registry.observe(stage, now - self._last)
+        self._last = now
+
+
+# Process-wide registry used by serial_reader, serial_hub, prediction_cache and the dashboard.
+REGISTRY = Registry()
+stage = REGISTRY.stage
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+observe_size = REGISTRY.observe_size
+set_gauge = REGISTRY.set
+stopwatch = REGISTRY.stopwatch
+
+
+def start_from_env():
+    """
+    HYDRO_METRICS_PORT (default 9108, 0 disables) and HYDRO_TRACE (JSON-lines path)
+    configure the endpoint and trace for processes like the Streamlit app.
+    """
+    port = int(os.environ.get("HYDRO_METRICS_PORT", DEFAULT_PORT))
+    if port:
+        try:
+            REGISTRY.serve(port)
+        except OSError:
+            # Port taken (e.g. a second app instance): keep collecting, skip serving.
+            pass
+    trace = os.environ.get("HYDRO_TRACE")
+    if trace:
+        REGISTRY.trace_to(trace)
+    return REGISTRY
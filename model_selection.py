@@ -0,0 +1,155 @@
+# model_selection.py
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.model_selection import GroupKFold
+from sklearn.multioutput import MultiOutputRegressor
+from sklearn.preprocessing import OneHotEncoder
+
+from train_model import FEATURES, TARGETS, load_dataset
+
+# Search space: (kind, {param: [values]})
+GRID = [
+    ("forest", {"n_estimators": [50, 100, 200, 400], "max_depth": [None, 12], "min_samples_leaf": [1, 2]}),
+    ("boosting", {"max_iter": [100, 300], "learning_rate": [0.05, 0.1], "max_leaf_nodes": [15, 31]}),
+]
+
+
+def candidates(grid=GRID):
+    for kind, space in grid:
+        keys = list(space)
+        for values in itertools.product(*(space[k] for k in keys)):
+            yield kind, dict(zip(keys, values))
+
+
+def make_estimator(kind, params):
+    if kind == "forest":
+        # Same shape as train_model.build_model: one forest per output
+        return MultiOutputRegressor(RandomForestRegressor(random_state=42, n_jobs=1, **params))
+    if kind == "boosting":
+        return MultiOutputRegressor(HistGradientBoostingRegressor(random_state=42, **params))
+    raise ValueError(f"Unknown model kind: {kind}")
+
+
+def make_preprocessor():
+    return ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), ["plant", "stage"])
+        ],
+        remainder="passthrough"
+    )
+
+
+def prepare_folds(df, n_splits=5):
+    """Fit the one-hot ColumnTransformer once per fold; every candidate reuses the encoded arrays."""
+    X, y = df[FEATURES], df[TARGETS].to_numpy(dtype=np.float64)
+    folds = []
+    for train_idx, test_idx in GroupKFold(n_splits=n_splits).split(X, y, groups=df["plant"]):
+        pre = make_preprocessor().fit(X.iloc[train_idx])
+        folds.append((
+            np.asarray(pre.transform(X.iloc[train_idx]), dtype=np.float64),
+            y[train_idx],
+            np.asarray(pre.transform(X.iloc[test_idx]), dtype=np.float64),
+            y[test_idx],
+        ))
+    return folds
+
+
+# Encoded folds live in each worker process, sent once through the pool initializer.
+_FOLDS = None
+
+
+def _init_worker(folds):
+    global _FOLDS
+    _FOLDS = folds
+
+
+def evaluate(kind, params, repeats=20):
+    """Cross-validate one candidate against the worker's folds."""
+    maes, r2s, fit_s, batch_s, single_s = [], [], [], [], []
+    for X_train, y_train, X_test, y_test in _FOLDS:
+        model = make_estimator(kind, params)
+        t = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_s.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        pred = model.predict(X_test)
+        batch_s.append((time.perf_counter() - t) / len(X_test))
+
+        row = X_test[:1]
+        t = time.perf_counter()
+        for _ in range(repeats):
+            model.predict(row)
+        single_s.append((time.perf_counter() - t) / repeats)
+
+        maes.append(np.mean(np.abs(pred - y_test)))
+        ss_res = np.sum((y_test - pred) ** 2, axis=0)
+        ss_tot = np.sum((y_test - y_test.mean(axis=0)) ** 2, axis=0)
+        r2s.append(np.mean(1 - ss_res / np.where(ss_tot > 0, ss_tot, 1)))
+    return {
+        "kind": kind,
+        "params": params,
+        "mae": float(np.mean(maes)),
+        "r2": float(np.mean(r2s)),
+        "fit_s": float(np.mean(fit_s)),
+        "predict_row_us": float(np.median(single_s) * 1e6),
+        "predict_batch_us_per_row": float(np.median(batch_s) * 1e6),
+    }
+
+
+def search(df, n_splits=5, workers=None, grid=GRID):
+    folds = prepare_folds(df, n_splits)
+    specs = list(candidates(grid))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(folds,)) as pool:
+        futures = [pool.submit(evaluate, kind, params) for kind, params in specs]
+        return [f.result() for f in futures]
+
+
+def pick_fastest(results, target_mae):
+    """Fastest single-row predictor whose CV MAE meets the target, or None."""
+    ok = [r for r in results if r["mae"] <= target_mae]
+    return min(ok, key=lambda r: r["predict_row_us"]) if ok else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grouped-CV search over forest and boosting settings.")
+    parser.add_argument("--data", default="data/hydro_data.csv")
+    parser.add_argument("--folds", type=int, default=5, help="GroupKFold splits (grouped by plant)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--target-mae", type=float, help="accuracy target in mg/L")
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    df = load_dataset(args.data)
+    print(f"🔄 Evaluating {len(list(candidates()))} candidates with {args.folds}-fold grouped CV...")
+    t = time.perf_counter()
+    results = search(df, args.folds, args.workers)
+    print(f"✅ Search finished in {time.perf_counter() - t:.1f}s")
+
+    results.sort(key=lambda r: r["mae"])
+    print(f"{'kind':<9} {'params':<52} {'MAE':>7} {'R2':>6} {'fit s':>7} {'row µs':>9} {'batch µs':>9}")
+    for r in results:
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        print(f"{r['kind']:<9} {params:<52} {r['mae']:>7.2f} {r['r2']:>6.2f} {r['fit_s']:>7.2f} "
+              f"{r['predict_row_us']:>9.0f} {r['predict_batch_us_per_row']:>9.1f}")
+
+    if args.target_mae is not None:
+        best = pick_fastest(results, args.target_mae)
+        if best is None:
+            print(f"❌ No candidate reaches MAE <= {args.target_mae}")
+        else:
+            print(f"✅ Fastest model with MAE <= {args.target_mae}: {best['kind']} {best['params']} "
+                  f"(MAE {best['mae']:.2f}, {best['predict_row_us']:.0f} µs/row)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved: {args.json}")
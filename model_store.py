@@ -0,0 +1,105 @@
+# model_store.py
+import argparse
+import multiprocessing
+import os
+import time
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE, "models", "npk_model.pkl")
+FOREST_PATH = os.path.join(BASE, "models", "npk_forest")
+
+
+def memory_kb():
+    """Resident memory of this process in kB: total, anonymous (private) and file-backed (shareable)."""
+    out = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile"):
+                    out[key] = int(value.split()[0])
+    except OSError:
+        import resource
+        out["VmRSS"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return out
+
+
+def load_model(model_path=MODEL_PATH, forest_path=FOREST_PATH, prefer_mmap=True):
+    """
+    Load the NPK model for inference.
+    Returns (kind, model): ("mmap", FlatForest) when the exported forest exists,
+    else ("pickle", sklearn Pipeline). The mmap form maps node arrays read-only,
+    so the call returns before any tree data is read and workers share pages;
+    it only loads the pickle if it is given a batch large enough for sklearn to win.
+    """
+    if prefer_mmap and os.path.isdir(forest_path):
+        from forest_compiler import FlatForest
+        return "mmap", FlatForest.load(forest_path, mmap_mode="r", pipeline_path=model_path)
+    import joblib
+    return "pickle", joblib.load(model_path)
+
+
+def model_stamp(model_path=MODEL_PATH, forest_path=FOREST_PATH, prefer_mmap=True):
+    """Changes whenever the model load_model would pick is rewritten or swapped in."""
+    path = forest_path if prefer_mmap and os.path.isdir(forest_path) else model_path
+    st = os.stat(path)
+    return path, st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _probe(prefer_mmap, queue):
+    before = memory_kb()
+    t = time.perf_counter()
+    kind, model = load_model(prefer_mmap=prefer_mmap)
+    load_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    if kind == "mmap":
+        model.predict_one("Tomato", "Vegetative", 26.0, 9000)
+    else:
+        import pandas as pd
+        model.predict(pd.DataFrame([{
+            "plant": "Tomato", "stage": "Vegetative", "temperature": 26.0,
+            "humidity": 65, "light_lux": 9000, "age_days": 30,
+        }]))
+    first_s = time.perf_counter() - t
+    after = memory_kb()
+    queue.put({
+        "pid": os.getpid(),
+        "kind": kind,
+        "load_ms": load_s * 1e3,
+        "first_predict_ms": first_s * 1e3,
+        "rss_kb": after.get("VmRSS", 0),
+        "model_anon_kb": after.get("RssAnon", 0) - before.get("RssAnon", 0),
+        "model_file_kb": after.get("RssFile", 0) - before.get("RssFile", 0),
+    })
+
+
+def report(workers=4, prefer_mmap=True):
+    """Load the model in `workers` fresh processes at once and collect their timings and memory."""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_probe, args=(prefer_mmap, queue)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    results = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report model load time and memory per worker process.")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    modes = [False]
+    if os.path.isdir(FOREST_PATH):
+        modes.insert(0, True)
+    else:
+        print(f"No exported forest at {FOREST_PATH} (run train_model.py); reporting pickle only")
+
+    print(f"{'kind':<7} {'pid':>7} {'load ms':>9} {'1st pred ms':>12} {'RSS MB':>8} {'private MB':>11} {'shared MB':>10}")
+    for prefer_mmap in modes:
+        for r in report(args.workers, prefer_mmap):
+            print(f"{r['kind']:<7} {r['pid']:>7} {r['load_ms']:>9.1f} {r['first_predict_ms']:>12.1f} "
+                  f"{r['rss_kb'] / 1024:>8.1f} {r['model_anon_kb'] / 1024:>11.1f} {r['model_file_kb'] / 1024:>10.1f}")
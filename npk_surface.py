@@ -0,0 +1,216 @@
+# npk_surface.py
+import argparse
+import os
+
+import numpy as np
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE, "models", "npk_model.pkl")
+SURFACE_PATH = os.path.join(BASE, "models", "npk_surface.npz")
+DATA_PATH = os.path.join(BASE, "data", "hydro_data.csv")
+
+# Sensor ranges covered by the table; inputs outside are clamped to the edge.
+TEMP_RANGE = (18.0, 32.0)
+LIGHT_RANGE = (3000.0, 12000.0)
+
+# The dashboard does not measure these, so the table is built at its defaults.
+DEFAULT_HUMIDITY = 65
+DEFAULT_AGE_DAYS = 30
+
+# Interpolation error limits (mg/L) checked before a surface is saved. A forest is
+# piecewise constant, so points next to a split are off by up to the step height
+# whatever the grid: the max limit catches a broken table, the mean a grid that
+# is too coarse.
+MAX_ERROR_TOLERANCE = 40.0
+MEAN_ERROR_TOLERANCE = 2.0
+
+
+def model_file_stamp(model_path=MODEL_PATH):
+    """(mtime_ns, size, inode) of the pickled model the surface is built from."""
+    from model_store import model_stamp
+    return tuple(int(v) for v in model_stamp(model_path, prefer_mmap=False)[1:])
+
+
+class NPKSurface:
+    """
+    Precomputed N/P/K targets on a regular temperature x light grid for every
+    (plant, stage) pair, looked up with bilinear interpolation.
+    `model_stamp` records the model file it was built from (see model_file_stamp).
+    """
+
+    def __init__(self, table, pairs, temp_axis, light_axis, humidity, age_days, model_stamp=()):
+        self.table = table  # (n_pairs, n_temp, n_light, 3) float32
+        self.pairs = [tuple(p) for p in pairs]
+        self.pair_index = {p: i for i, p in enumerate(self.pairs)}
+        self.temp_axis = temp_axis  # (start, step, count)
+        self.light_axis = light_axis
+        self.humidity = humidity
+        self.age_days = age_days
+        self.model_stamp = tuple(model_stamp)
+
+    @classmethod
+    def build(cls, model, pairs, temp_step=0.5, light_step=250.0,
+              humidity=DEFAULT_HUMIDITY, age_days=DEFAULT_AGE_DAYS):
+        """Evaluate model.predict on the full grid for every pair."""
+        import pandas as pd
+
+        temps = _axis_points(TEMP_RANGE, temp_step)
+        lights = _axis_points(LIGHT_RANGE, light_step)
+        tt, ll = np.meshgrid(temps, lights, indexing="ij")
+        cells = tt.size
+        table = np.empty((len(pairs), len(temps), len(lights), 3), dtype=np.float32)
+        for i, (plant, stage) in enumerate(pairs):
+            grid = pd.DataFrame({
+                "plant": [plant] * cells,
+                "stage": [stage] * cells,
+                "temperature": tt.ravel(),
+                "humidity": humidity,
+                "light_lux": ll.ravel(),
+                "age_days": age_days,
+            })
+            table[i] = model.predict(grid).reshape(len(temps), len(lights), 3)
+        return cls(
+            table, pairs,
+            (TEMP_RANGE[0], temp_step, len(temps)),
+            (LIGHT_RANGE[0], light_step, len(lights)),
+            humidity, age_days,
+        )
+
+    @classmethod
+    def load(cls, path=SURFACE_PATH, model_path=None):
+        """
+        Load a saved surface. With model_path, raise ValueError unless it was built
+        from that model file as it is now (a missing model file is not checked).
+        """
+        with np.load(path) as data:
+            surface = cls(
+                data["table"], data["pairs"].tolist(),
+                tuple(data["temp_axis"]), tuple(data["light_axis"]),
+                float(data["humidity"]), float(data["age_days"]),
+                data["model_stamp"].tolist() if "model_stamp" in data else (),
+            )
+        if model_path is not None and os.path.exists(model_path):
+            if surface.model_stamp != model_file_stamp(model_path):
+                raise ValueError(f"{path} was built from a different {os.path.basename(model_path)}; rebuild it")
+        return surface
+
+    def save(self, path=SURFACE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            table=self.table,
+            pairs=np.asarray(self.pairs, dtype=str),
+            temp_axis=np.asarray(self.temp_axis, dtype=np.float64),
+            light_axis=np.asarray(self.light_axis, dtype=np.float64),
+            humidity=self.humidity,
+            age_days=self.age_days,
+            model_stamp=np.asarray(self.model_stamp, dtype=np.int64),
+        )
+
+    def lookup(self, plant, stage, temperature, light_lux):
+        """Interpolated (N, P, K) for one reading, or None for an unknown plant/stage pair."""
+        i = self.pair_index.get((plant, stage))
+        if i is None:
+            return None
+        npk = self.lookup_batch(np.array([i]), np.array([temperature]), np.array([light_lux]))[0]
+        return tuple(float(v) for v in npk)
+
+    def lookup_batch(self, pair_idx, temperature, light_lux):
+        """Vectorized lookup. pair_idx indexes self.pairs. Returns an (N, 3) array."""
+        it, wt = _cell(np.asarray(temperature, dtype=np.float64), self.temp_axis)
+        il, wl = _cell(np.asarray(light_lux, dtype=np.float64), self.light_axis)
+        p = np.asarray(pair_idx)
+        t = self.table
+        wt = wt[:, None]
+        wl = wl[:, None]
+        return (
+            t[p, it, il] * (1 - wt) * (1 - wl)
+            + t[p, it + 1, il] * wt * (1 - wl)
+            + t[p, it, il + 1] * (1 - wt) * wl
+            + t[p, it + 1, il + 1] * wt * wl
+        )
+
+    def max_error(self, model, n_samples=5000, seed=0):
+        """Max and mean absolute N/P/K error of the interpolation against model at random off-grid points."""
+        import pandas as pd
+
+        rng = np.random.default_rng(seed)
+        pair_idx = rng.integers(0, len(self.pairs), n_samples)
+        temps = rng.uniform(*TEMP_RANGE, n_samples)
+        lights = rng.uniform(*LIGHT_RANGE, n_samples)
+        pairs = np.asarray(self.pairs, dtype=object)[pair_idx]
+        expected = model.predict(pd.DataFrame({
+            "plant": pairs[:, 0],
+            "stage": pairs[:, 1],
+            "temperature": temps,
+            "humidity": self.humidity,
+            "light_lux": lights,
+            "age_days": self.age_days,
+        }))
+        err = np.abs(self.lookup_batch(pair_idx, temps, lights) - expected)
+        return err.max(axis=0), err.mean(axis=0)
+
+
+def build_checked(model, pairs, model_path=MODEL_PATH, temp_step=0.5, light_step=250.0,
+                  max_tolerance=MAX_ERROR_TOLERANCE, mean_tolerance=MEAN_ERROR_TOLERANCE):
+    """
+    Build a surface from `model` (loaded from model_path), stamp it with that file
+    and check its interpolation error. Returns (surface, max_err, mean_err); raises
+    ValueError when the error is over either tolerance.
+    """
+    surface = NPKSurface.build(model, pairs, temp_step, light_step)
+    surface.model_stamp = model_file_stamp(model_path)
+    max_err, mean_err = surface.max_error(model)
+    if max_err.max() > max_tolerance or mean_err.max() > mean_tolerance:
+        raise ValueError(
+            f"interpolation error too high: max {max_err.round(2).tolist()} (limit {max_tolerance}), "
+            f"mean {mean_err.round(2).tolist()} (limit {mean_tolerance}) mg/L; use a finer grid"
+        )
+    return surface, max_err, mean_err
+
+
+def _axis_points(bounds, step):
+    count = int(round((bounds[1] - bounds[0]) / step)) + 1
+    return bounds[0] + step * np.arange(count)
+
+
+def _cell(values, axis):
+    """Lower grid index and fractional weight for each value, clamped to the axis."""
+    start, step, count = axis
+    pos = np.clip((values - start) / step, 0, count - 1)
+    idx = np.minimum(pos.astype(np.intp), int(count) - 2)
+    return idx, pos - idx
+
+
+if __name__ == "__main__":
+    import sys
+
+    import joblib
+
+    from dataset import load_dataset
+
+    parser = argparse.ArgumentParser(description="Precompute the NPK target lookup table.")
+    parser.add_argument("--temp-step", type=float, default=0.5, help="°C between grid points")
+    parser.add_argument("--light-step", type=float, default=250.0, help="lux between grid points")
+    parser.add_argument("--max-error", type=float, default=MAX_ERROR_TOLERANCE, help="max abs error limit (mg/L)")
+    parser.add_argument("--mean-error", type=float, default=MEAN_ERROR_TOLERANCE, help="mean abs error limit (mg/L)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--out", default=SURFACE_PATH)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    pairs = load_dataset(DATA_PATH, columns=["plant", "stage"]).drop_duplicates().astype(str).to_numpy().tolist()
+
+    print(f"🔄 Evaluating model on grid for {len(pairs)} plant/stage pairs...")
+    try:
+        surface, max_err, mean_err = build_checked(
+            model, pairs, args.model, args.temp_step, args.light_step, args.max_error, args.mean_error
+        )
+    except ValueError as e:
+        print(f"❌ Surface not saved: {e}")
+        sys.exit(1)
+    surface.save(args.out)
+    size_kb = os.path.getsize(args.out) / 1024
+    print(f"✅ Surface saved: {args.out} ({surface.table.shape}, {size_kb:.0f} KB)")
+    print(f"Max interpolation error (N, P, K): {max_err.round(2).tolist()} mg/L")
+    print(f"Mean interpolation error (N, P, K): {mean_err.round(2).tolist()} mg/L")
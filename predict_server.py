@@ -0,0 +1,266 @@
+# predict_server.py
+import argparse
+import http.client
+import json
+import math
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import numpy as np
+
+import metrics
+from model_store import FOREST_PATH, MODEL_PATH, load_model, model_stamp
+
+INPUT_COLUMNS = ["plant", "stage", "temperature", "humidity", "light_lux", "age_days"]
+DEFAULTS = {"humidity": 65, "age_days": 30}
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+def _columns(rows):
+    """Validate request rows and return {column: list}; raises ValueError/KeyError/TypeError."""
+    if not isinstance(rows, list):
+        raise TypeError("rows must be a list of objects")
+    columns = {c: [] for c in INPUT_COLUMNS}
+    for row in rows:
+        if not isinstance(row, dict):
+            raise TypeError("each row must be an object")
+        for c in ("plant", "stage"):
+            if not isinstance(row[c], str):
+                raise TypeError(f"{c} must be a string")
+            columns[c].append(row[c])
+        for c in ("temperature", "humidity", "light_lux", "age_days"):
+            value = float(row[c] if c in row else DEFAULTS[c])
+            if not math.isfinite(value):
+                raise ValueError(f"{c} must be a finite number, got {value}")
+            columns[c].append(value)
+    return columns
+
+
+class BatchError(RuntimeError):
+    """The shared batch predict failed; not caused by this request's own rows."""
+
+
+class _Request:
+    __slots__ = ("columns", "n_rows", "done", "result", "error")
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.n_rows = len(columns["plant"])
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collects concurrent predict requests and runs one vectorized predict per batch.
+    A batch closes `max_wait` seconds after its first request arrives, or as soon
+    as it holds `max_rows` rows. The model is reloaded when it changes on disk.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, forest_path=FOREST_PATH, prefer_mmap=True,
+                 max_wait=0.002, max_rows=1024, check_interval=1.0):
+        self.model_path = model_path
+        self.forest_path = forest_path
+        self.prefer_mmap = prefer_mmap
+        self.max_wait = max_wait
+        self.max_rows = max_rows
+        self.check_interval = check_interval
+        self.kind, self.model = load_model(model_path, forest_path, prefer_mmap)
+        self.stamp = model_stamp(model_path, forest_path, prefer_mmap)
+        self._next_check = time.monotonic() + check_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def predict(self, rows, timeout=30.0):
+        """
+        rows: list of dicts with INPUT_COLUMNS (humidity/age_days optional). Returns (n, 3) list.
+        Rows are checked here, before batching, so a bad request fails alone.
+        """
+        request = _Request(_columns(rows))
+        self._queue.put(request)
+        metrics.set_gauge("queue_depth", self._queue.qsize(), help="requests waiting for a batch")
+        if not request.done.wait(timeout):
+            raise TimeoutError("prediction timed out")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        n_rows = batch[0].n_rows
+        deadline = time.monotonic() + self.max_wait
+        while n_rows < self.max_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            n_rows += request.n_rows
+        metrics.set_gauge("queue_depth", self._queue.qsize(), help="requests waiting for a batch")
+        return batch, n_rows
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        stamp = model_stamp(self.model_path, self.forest_path, self.prefer_mmap)
+        if stamp != self.stamp:
+            self.kind, self.model = load_model(self.model_path, self.forest_path, self.prefer_mmap)
+            self.stamp = stamp
+            metrics.inc("model_reloads")
+
+    def _run(self):
+        while True:
+            batch, n_rows = self._collect()
+            metrics.observe_size("batch_rows", n_rows, help="rows per vectorized predict")
+            metrics.observe_size("batch_requests", len(batch), help="requests merged per batch")
+            try:
+                self._maybe_reload()
+                columns = {c: [] for c in INPUT_COLUMNS}
+                for request in batch:
+                    for c in INPUT_COLUMNS:
+                        columns[c].extend(request.columns[c])
+                with metrics.stage("batch_predict"):
+                    pred = self._predict(columns)
+                start = 0
+                for request in batch:
+                    end = start + request.n_rows
+                    request.result = pred[start:end].tolist()
+                    start = end
+            except Exception as e:
+                # Rows were validated per request, so this is a server-side failure for everyone
+                error = BatchError(f"batch predict failed: {e}")
+                for request in batch:
+                    request.error = error
+            finally:
+                for request in batch:
+                    request.done.set()
+
+    def _predict(self, columns):
+        if self.kind == "mmap":
+            return self.model.predict({c: np.asarray(v) for c, v in columns.items()})
+        import pandas as pd
+        return np.asarray(self.model.predict(pd.DataFrame(columns)))
+
+
+def make_server(batcher, host="127.0.0.1", port=8765):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive: clients reuse one connection
+
+        def _send(self, code, body, content_type="application/json"):
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/metrics":
+                self._send(200, metrics.REGISTRY.render().encode(), "text/plain; version=0.0.4; charset=utf-8")
+            elif path == "/health":
+                self._send(200, json.dumps({"model": batcher.kind, "stamp": list(batcher.stamp)}).encode())
+            else:
+                self._send(404, b'{"error": "not found"}')
+
+        def do_POST(self):
+            if self.path.split("?")[0] != "/predict":
+                self._send(404, b'{"error": "not found"}')
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                rows = payload["rows"]
+                npk = batcher.predict(rows)
+                metrics.inc("requests")
+                metrics.inc("rows", len(rows))
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, json.dumps({"error": str(e)}).encode())
+                return
+            except Exception as e:
+                self._send(500, json.dumps({"error": str(e)}).encode())
+                return
+            self._send(200, json.dumps({"npk": npk, "stamp": list(batcher.stamp)}).encode())
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 128  # listen backlog; the default 5 resets bursts of new clients
+
+    return Server((host, port), Handler)
+
+
+class PredictClient:
+    """
+    Client for predict_server with one keep-alive connection per thread.
+    `stamp` holds the server's model stamp from the last response.
+    """
+
+    def __init__(self, url=DEFAULT_URL, timeout=30.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.stamp = None
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def predict(self, rows):
+        """Predict [[N, P, K], ...] for a list of row dicts."""
+        body = json.dumps({"rows": rows})
+        for attempt in (0, 1):
+            conn = self._conn()
+            try:
+                conn.request("POST", "/predict", body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                data = json.loads(response.read())
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # Stale keep-alive connection (server restarted): reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(f"predict_server error {response.status}: {data.get('error')}")
+        self.stamp = tuple(data["stamp"])
+        return data["npk"]
+
+    def predict_one(self, plant, stage, temperature, light_lux, humidity=65, age_days=30):
+        row = {"plant": plant, "stage": stage, "temperature": temperature,
+               "light_lux": light_lux, "humidity": humidity, "age_days": age_days}
+        return tuple(self.predict([row])[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared micro-batching NPK prediction server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="how long a batch stays open")
+    parser.add_argument("--max-rows", type=int, default=1024)
+    parser.add_argument("--pickle", action="store_true", help="serve the sklearn pipeline, not the flat forest")
+    args = parser.parse_args()
+
+    t = time.perf_counter()
+    batcher = MicroBatcher(prefer_mmap=not args.pickle, max_wait=args.max_wait_ms / 1000, max_rows=args.max_rows)
+    print(f"✅ Loaded {batcher.kind} model in {time.perf_counter() - t:.2f}s")
+    server = make_server(batcher, args.host, args.port)
+    print(f"✅ Serving on http://{args.host}:{args.port} (POST /predict, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,143 @@
+# prediction_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from model_store import MODEL_PATH, load_model, model_stamp
+
+# Sensor resolution used to quantize inputs before lookup.
+DEFAULT_RESOLUTION = {
+    "temperature": 0.1,
+    "humidity": 1.0,
+    "light_lux": 10.0,
+    "age_days": 1.0,
+}
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache in front of model.predict.
+    Keyed on (plant, stage, temperature, light_lux, humidity, age_days) with the
+    numeric inputs quantized to `resolution`. Misses go to the memory-mapped
+    flat forest next to the model when it exists, else to the sklearn pipeline.
+    The model is reloaded and the cache cleared when it changes on disk.
+    With `server_url`, misses go to a shared predict_server instead and the cache
+    is cleared when the server reports a different model.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, maxsize=4096, resolution=None,
+                 check_interval=1.0, forest_path=None, server_url=None):
+        self.model_path = model_path
+        self.forest_path = forest_path or os.path.join(os.path.dirname(model_path), "npk_forest")
+        self.maxsize = maxsize
+        self.resolution = dict(DEFAULT_RESOLUTION, **(resolution or {}))
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._model = None
+        self._model_kind = None
+        self._model_stamp = None
+        self._next_check = 0.0
+        self._client = None
+        if server_url:
+            from predict_server import PredictClient
+            self._client = PredictClient(server_url)
+            self._model_kind = "remote"
+
+    def _quantize(self, field, value):
+        step = self.resolution[field]
+        return round(round(value / step) * step, 6)
+
+    def _ensure_model(self):
+        if self._client is not None:
+            return
+        now = time.monotonic()
+        if self._model is not None and now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        stamp = model_stamp(self.model_path, self.forest_path)
+        if stamp != self._model_stamp:
+            self._model_kind, self._model = load_model(self.model_path, self.forest_path)
+            self._model_stamp = stamp
+            self._cache.clear()
+
+    @property
+    def model(self):
+        with self._lock:
+            self._ensure_model()
+            return self._model
+
+    def predict(self, plant, stage, temperature, light_lux, humidity=65, age_days=30):
+        """Return predicted (N, P, K) for one reading."""
+        key = (
+            plant,
+            stage,
+            self._quantize("temperature", temperature),
+            self._quantize("light_lux", light_lux),
+            self._quantize("humidity", humidity),
+            self._quantize("age_days", age_days),
+        )
+        with self._lock:
+            self._ensure_model()
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+            model, kind = self._model, self._model_kind
+
+        if self._client is not None:
+            with metrics.stage("model_predict"):
+                result = self._client.predict_one(key[0], key[1], key[2], key[3], key[4], key[5])
+            with self._lock:
+                if self._client.stamp != self._model_stamp:
+                    self._cache.clear()
+                    self._model_stamp = self._client.stamp
+                self._cache[key] = result
+                if len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+            return result
+
+        if kind == "mmap":
+            with metrics.stage("model_predict"):
+                result = model.predict_one(key[0], key[1], key[2], key[3], key[4], key[5])
+        else:
+            import pandas as pd  # only the sklearn pipeline needs a DataFrame
+            with metrics.stage("dataframe"):
+                df_input = pd.DataFrame([{
+                    "plant": key[0],
+                    "stage": key[1],
+                    "temperature": key[2],
+                    "humidity": key[4],
+                    "light_lux": key[3],
+                    "age_days": key[5],
+                }])
+            with metrics.stage("model_predict"):
+                result = tuple(float(v) for v in model.predict(df_input)[0])
+
+        with self._lock:
+            if model is self._model:
+                self._cache[key] = result
+                if len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "model": self._model_kind,
+            }
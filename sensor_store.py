@@ -0,0 +1,214 @@
+# sensor_store.py
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from serial_reader import FIELDS
+
+BASE = os.path.dirname(os.path.abspath(__file__))
+STORE_PATH = os.path.join(BASE, "store")
+
+COLUMNS = FIELDS + ("N", "P", "K")
+
+# 40 bytes per reading: about 100 MB per tank per month at 1 Hz.
+RECORD_DTYPE = np.dtype([("ts", "<f8")] + [(c, "<f4") for c in COLUMNS])
+
+ROLLUP_DTYPE = np.dtype(
+    [("ts", "<f8"), ("count", "<u4")]
+    + [(f"{c}_{stat}", "<f4") for c in COLUMNS for stat in ("min", "mean", "max")]
+)
+
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+
+
+class TankStore:
+    """
+    Append-only, memory-mapped store for one tank.
+    readings.bin holds fixed-width records in time order; rollup_<res>.bin holds
+    closed min/mean/max buckets per resolution. Queries return np.memmap views.
+    The bucket still being filled lives in memory and is rebuilt from raw
+    readings on open.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._maps = {}
+        self._pending = {}
+        self._last_ts = -np.inf
+
+        raw = self._open("readings", RECORD_DTYPE)
+        if len(raw):
+            self._last_ts = float(raw["ts"][-1])
+        for res, step in RESOLUTIONS.items():
+            closed = self._open(f"rollup_{res}", ROLLUP_DTYPE)
+            start = closed["ts"][-1] + step if len(closed) else -np.inf
+            self._pending[res] = None
+            tail = raw[np.searchsorted(raw["ts"], start):]
+            if len(tail):
+                self._roll(res, step, np.array(tail))
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _open(self, name, dtype):
+        """Open a record file for appending, dropping any torn record at the end."""
+        path = self._file(name)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size % dtype.itemsize:
+            with open(path, "r+b") as f:
+                f.truncate(size - size % dtype.itemsize)
+        self._files[name] = open(path, "ab")
+        self._maps.pop(name, None)
+        return self._view(name, dtype)
+
+    def _view(self, name, dtype):
+        path = self._file(name)
+        count = os.path.getsize(path) // dtype.itemsize
+        cached = self._maps.get(name)
+        if cached is not None and len(cached) == count:
+            return cached
+        view = np.memmap(path, dtype=dtype, mode="r", shape=(count,)) if count else np.empty(0, dtype)
+        self._maps[name] = view
+        return view
+
+    def _write(self, name, records):
+        f = self._files[name]
+        f.write(records.tobytes())
+        f.flush()
+
+    def append(self, reading, npk=None, ts=None):
+        """
+        Append one parsed reading (dict from parse_block) with optional predicted (N, P, K).
+        Returns False, without writing, if ts is not newer than the last stored reading.
+        """
+        rec = np.zeros(1, RECORD_DTYPE)
+        rec["ts"] = reading.get("ts", time.time()) if ts is None else ts
+        for c in FIELDS:
+            rec[c] = reading.get(c, np.nan)
+        rec["N"], rec["P"], rec["K"] = npk if npk is not None else (np.nan,) * 3
+        return self.append_records(rec) == 1
+
+    def append_records(self, records):
+        """Append a RECORD_DTYPE array in time order; records not newer than the store are skipped."""
+        with self._lock:
+            ts = records["ts"]
+            if np.any(np.diff(ts) < 0):
+                raise ValueError("records must be sorted by timestamp")
+            records = records[ts > self._last_ts]
+            if not len(records):
+                return 0
+            self._write("readings", records)
+            self._last_ts = float(records["ts"][-1])
+            for res, step in RESOLUTIONS.items():
+                self._roll(res, step, records)
+            return len(records)
+
+    def _roll(self, res, step, records):
+        """Fold records into rollup buckets; every bucket but the last is closed and written."""
+        bucket = np.floor(records["ts"] / step) * step
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        counts = np.diff(np.r_[starts, len(records)])
+        stats = {"ts": bucket[starts], "count": counts}
+        for c in COLUMNS:
+            v = records[c].astype(np.float64)
+            valid = ~np.isnan(v)
+            stats[c] = (
+                np.fmin.reduceat(v, starts),
+                np.add.reduceat(np.where(valid, v, 0.0), starts),
+                np.add.reduceat(valid.astype(np.int64), starts),
+                np.fmax.reduceat(v, starts),
+            )
+
+        pending = self._pending[res]
+        if pending is not None and pending["ts"] == stats["ts"][0]:
+            stats["count"][0] += pending["count"]
+            for c in COLUMNS:
+                lo, total, n, hi = stats[c]
+                plo, ptotal, pn, phi = pending[c]
+                lo[0], hi[0] = np.fmin(lo[0], plo), np.fmax(hi[0], phi)
+                total[0] += ptotal
+                n[0] += pn
+        elif pending is not None:
+            self._write(f"rollup_{res}", self._bucket_records(pending, slice(None)))
+
+        closed = slice(0, len(starts) - 1)
+        if len(starts) > 1:
+            self._write(f"rollup_{res}", self._bucket_records(stats, closed))
+        last = len(starts) - 1
+        self._pending[res] = {
+            "ts": stats["ts"][last],
+            "count": stats["count"][last],
+            **{c: tuple(a[last] for a in stats[c]) for c in COLUMNS},
+        }
+
+    @staticmethod
+    def _bucket_records(stats, sel):
+        ts = np.atleast_1d(stats["ts"])[sel]
+        out = np.zeros(len(ts), ROLLUP_DTYPE)
+        out["ts"] = ts
+        out["count"] = np.atleast_1d(stats["count"])[sel]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for c in COLUMNS:
+                lo, total, n, hi = (np.atleast_1d(a)[sel] for a in stats[c])
+                out[f"{c}_min"] = lo
+                out[f"{c}_mean"] = np.where(n > 0, total / np.maximum(n, 1), np.nan)
+                out[f"{c}_max"] = hi
+        return out
+
+    def query(self, start=None, end=None):
+        """Readings with start <= ts < end as a zero-copy memmap view."""
+        with self._lock:
+            return _time_slice(self._view("readings", RECORD_DTYPE), start, end)
+
+    def rollup(self, resolution, start=None, end=None):
+        """Closed 'minute' / 'hour' / 'day' buckets with start <= ts < end as a memmap view."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution!r}, expected one of {list(RESOLUTIONS)}")
+        with self._lock:
+            return _time_slice(self._view(f"rollup_{resolution}", ROLLUP_DTYPE), start, end)
+
+    def close(self):
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+            self._maps.clear()
+
+
+def _time_slice(view, start, end):
+    ts = view["ts"]
+    lo = 0 if start is None else np.searchsorted(ts, start, side="left")
+    hi = len(view) if end is None else np.searchsorted(ts, end, side="left")
+    return view[lo:hi]
+
+
+class SensorStore:
+    """Directory of per-tank stores under root."""
+
+    def __init__(self, root=STORE_PATH):
+        self.root = root
+        self._tanks = {}
+        self._lock = threading.Lock()
+
+    def tank(self, tank_id):
+        with self._lock:
+            store = self._tanks.get(tank_id)
+            if store is None:
+                safe = re.sub(r"[^A-Za-z0-9_.-]", "_", str(tank_id)).strip(".") or "tank"
+                store = self._tanks[tank_id] = TankStore(os.path.join(self.root, safe))
+            return store
+
+    def tanks(self):
+        return sorted(os.listdir(self.root)) if os.path.isdir(self.root) else []
+
+    def close(self):
+        with self._lock:
+            for store in self._tanks.values():
+                store.close()
+            self._tanks.clear()
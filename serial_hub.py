@@ -0,0 +1,108 @@
+# serial_hub.py
+import threading
+import time
+from collections import deque
+
+import metrics
+from serial_reader import read_serial
+
+
+class SerialHub:
+    """
+    Single background reader for one serial port.
+    Keeps the latest readings in a ring buffer and fans them out to any
+    number of subscribers, so viewers never touch the port themselves.
+    """
+
+    def __init__(self, port, baud=9600, history=600, retry_delay=2.0):
+        self.port = port
+        self.baud = baud
+        self.retry_delay = retry_delay
+        self.connected = False
+        self.error = None
+        self._buffer = deque(maxlen=history)  # (seq, reading)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name=f"serial-hub-{self.port}", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        first = True
+        while not self._stop.is_set():
+            if not first:
+                metrics.inc("reconnects")
+            first = False
+            try:
+                for data in read_serial(self.port, self.baud):
+                    self.connected = True
+                    self.error = None
+                    data["ts"] = time.time()
+                    self.publish(data)
+                    if self._stop.is_set():
+                        break
+            except RuntimeError as e:
+                self.error = str(e)
+            self.connected = False
+            self._stop.wait(self.retry_delay)
+
+    def publish(self, data):
+        with self._cond:
+            self._seq += 1
+            self._buffer.append((self._seq, data))
+            self._cond.notify_all()
+
+    def latest(self):
+        with self._cond:
+            return self._buffer[-1][1] if self._buffer else None
+
+    def history(self):
+        with self._cond:
+            return [data for _, data in self._buffer]
+
+    def subscribe(self):
+        return Subscription(self)
+
+
+class Subscription:
+    """Cursor into a hub's ring buffer. Slow subscribers skip to the oldest kept reading."""
+
+    def __init__(self, hub):
+        self.hub = hub
+        with hub._cond:
+            # Start one behind the newest so a new viewer gets a reading immediately.
+            self._cursor = hub._seq - 1 if hub._buffer else hub._seq
+
+    def get(self, timeout=None):
+        """Wait for the next unseen reading; returns None on timeout."""
+        hub = self.hub
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with hub._cond:
+            while hub._seq <= self._cursor:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                hub._cond.wait(remaining)
+            oldest = hub._buffer[0][0]
+            index = max(self._cursor + 1, oldest) - oldest
+            seq, data = hub._buffer[index]
+            self._cursor = seq
+            return data
+
+    def drain(self):
+        """Return every unseen reading still in the buffer without waiting."""
+        hub = self.hub
+        with hub._cond:
+            items = [data for seq, data in hub._buffer if seq > self._cursor]
+            self._cursor = hub._seq
+            return items
@@ -1,60 +1,309 @@
 # serial_reader.py
+import binascii
+import select
 import serial
+import struct
 import time
-import re
 import os
 
+import metrics
+
 BASE = os.path.dirname(os.path.abspath(__file__))
 
+# poll() works on serial fds on POSIX; Windows falls back to blocking reads.
+_HAS_POLL = hasattr(select, "poll") and os.name == "posix"
+
+# Column order used by parse_log and anything storing readings.
+FIELDS = ("tds", "ph", "water_level", "light", "temperature")
+
+SEPARATOR = b"------"
+
+# Line label -> (field, converter). Built once; parsing is a dict lookup per line.
+_LINE_TABLE = {
+    b"TDS": ("tds", float),
+    b"pH": ("ph", float),
+    b"Water Level": ("water_level", int),
+    b"Light": ("light", int),
+    b"Temperature": ("temperature", float),
+    b"Seq": ("seq", int),  # optional block counter (simulator, binary frames)
+}
+
+# Binary frame (see arduino/hydro_sensors/hydro_sensors.ino), little-endian, 16 bytes:
+#   sync 0xAA 0x55 | version u8 | seq u16 | tds u16 (0.1 ppm) | ph u16 (0.01)
+#   | water_level u8 | light u16 | temperature i16 (0.01 °C) | CRC16 u16
+# The CRC (CCITT-FALSE) covers everything between the sync bytes and itself.
+SYNC = b"\xaa\x55"
+FRAME_VERSION = 1
+FRAME = struct.Struct("<2sBHHHBHhH")
+
+# Fixed-point divisor per field, in FRAME field order after seq.
+_FRAME_SCALE = (("tds", 10), ("ph", 100), ("water_level", None), ("light", None), ("temperature", 100))
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), as computed by the Arduino sketch."""
+    return binascii.crc_hqx(data, crc)
+
+
+def encode_frame(reading, seq):
+    """Pack one reading dict into a binary frame (used by the simulator and for testing)."""
+    raw = []
+    for field, scale in _FRAME_SCALE:
+        value = reading[field]
+        raw.append(round(value * scale) if scale else int(value))
+    body = FRAME.pack(SYNC, FRAME_VERSION, seq & 0xFFFF, *raw, 0)[:-2]
+    return body + struct.pack("<H", crc16(body[2:]))
+
+
+def decode_frame(frame):
+    """Unpack one FRAME.size-byte frame. Returns the reading dict, or None if the CRC fails."""
+    sync, version, seq, *raw, crc = FRAME.unpack(frame)
+    if sync != SYNC or version != FRAME_VERSION or crc16(frame[2:-2]) != crc:
+        return None
+    out = {"seq": seq}
+    for (field, scale), value in zip(_FRAME_SCALE, raw):
+        out[field] = value / scale if scale else value
+    return out
+
+
+# Everything that cannot be part of a number (units, degree signs, '\r', spaces).
+_NOT_NUMERIC = bytes(b for b in range(256) if b not in b"0123456789.-+")
+
+
+def _parse_line(line, out):
+    """Parse one raw 'Label: value unit' line (bytes) into out. Returns True on a match."""
+    label, sep, value = line.partition(b":")
+    if not sep:
+        return False
+    entry = _LINE_TABLE.get(label.strip())
+    if entry is None:
+        return False
+    token = value.strip(_NOT_NUMERIC)
+    if not token:
+        return False
+    token = token.split(None, 1)[0].strip(_NOT_NUMERIC)
+    field, conv = entry
+    try:
+        number = float(token)
+    except ValueError:
+        return False
+    out[field] = int(number) if conv is int else number
+    return True
+
+
 def parse_block(block):
+    """
+    Parse one sensor block (bytes or str) into a dict.
+    Only the fields present in the block are returned.
+    """
+    if isinstance(block, str):
+        block = block.encode()
     out = {}
     for line in block.splitlines():
-        line = line.strip()
-        if line.startswith("TDS:"):
-            nums = re.findall(r"[-+]?\d*\.?\d+|\d+", line)
-            if nums:
-                out["tds"] = float(nums[0])
-        elif line.startswith("pH:"):
-            nums = re.findall(r"[-+]?\d*\.?\d+|\d+", line)
-            if nums:
-                out["ph"] = float(nums[0])
-        elif line.startswith("Water Level:"):
-            nums = re.findall(r"-?\d+", line)
-            if nums:
-                out["water_level"] = int(nums[0])
-        elif line.startswith("Light:"):
-            nums = re.findall(r"[-+]?\d*\.?\d+|\d+", line)
-            if nums:
-                out["light"] = int(nums[0])
-        elif line.startswith("Temperature:"):
-            nums = re.findall(r"[-+]?\d*\.?\d+|\d+", line)
-            if nums:
-                out["temperature"] = float(nums[0])
+        _parse_line(line, out)
     return out
 
-def read_serial(port="COM3", baud=9600, timeout=1):
+
+class BlockParser:
     """
-    Generator yielding dicts of parsed data blocks.
+    Incremental parser fed raw readline() output one line at a time.
+    feed() returns the parsed dict when a separator line closes a block, else None.
+    """
+
+    __slots__ = ("_current",)
+
+    def __init__(self):
+        self._current = {}
+
+    def feed(self, line):
+        if SEPARATOR in line:
+            out, self._current = self._current, {}
+            return out
+        _parse_line(line, self._current)
+        return None
+
+
+class StreamDecoder:
+    """
+    Incremental decoder for raw serial bytes in either protocol.
+    feed(chunk) returns the list of readings completed by that chunk.
+
+    The mode is picked from the data: a frame with a valid CRC selects binary
+    (text is pure ASCII, so it never contains the 0xAA sync byte), a separator
+    line selects text. In binary mode a bad CRC resyncs one byte past the sync
+    instead of dropping a whole block, and gaps in seq (both modes) count as
+    dropped frames. Counters: frames, crc_errors, dropped, overruns.
+    """
+
+    def __init__(self, line_limit=256):
+        self.line_limit = line_limit
+        self.mode = None
+        self.frames = 0
+        self.crc_errors = 0
+        self.dropped = 0
+        self.overruns = 0
+        self._buf = bytearray()
+        self._parser = BlockParser()
+        self._last_seq = None
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "crc_errors": self.crc_errors,
+            "dropped": self.dropped,
+            "overruns": self.overruns,
+        }
+
+    def feed(self, chunk):
+        self._buf += chunk
+        if self.mode is None:
+            self._detect()
+        if self.mode == "binary":
+            out = self._feed_binary()
+        elif self.mode == "text":
+            out = self._feed_text()
+        else:
+            out = []
+        for data in out:
+            self._check_seq(data.get("seq"))
+        self.frames += len(out)
+        return out
+
+    def _detect(self):
+        buf = self._buf
+        start = buf.find(SYNC)
+        while start != -1 and len(buf) - start >= FRAME.size:
+            if decode_frame(bytes(buf[start:start + FRAME.size])) is not None:
+                self.mode = "binary"
+                return
+            start = buf.find(SYNC, start + 1)
+        if SEPARATOR in buf:
+            self.mode = "text"
+        elif len(buf) > 4 * self.line_limit:
+            # Keep only the tail while neither protocol has shown up yet.
+            del buf[:-self.line_limit]
+
+    def _feed_binary(self):
+        buf, out, size = self._buf, [], FRAME.size
+        while True:
+            start = buf.find(SYNC)
+            if start == -1:
+                # Keep a trailing 0xAA: it may be the first half of the next sync.
+                del buf[:len(buf) - 1 if buf[-1:] == SYNC[:1] else len(buf)]
+                return out
+            if len(buf) - start < size:
+                del buf[:start]
+                return out
+            data = decode_frame(bytes(buf[start:start + size]))
+            if data is None:
+                self.crc_errors += 1
+                del buf[:start + 1]
+                continue
+            out.append(data)
+            del buf[:start + size]
+
+    def _feed_text(self):
+        buf, out = self._buf, []
+        end = buf.rfind(b"\n")
+        if end == -1:
+            if len(buf) > self.line_limit:
+                # Line longer than line_limit: drop it and resync on the next one.
+                self.overruns += 1
+                buf.clear()
+            return out
+        for line in bytes(buf[:end + 1]).splitlines():
+            if len(line) > self.line_limit:
+                self.overruns += 1
+                continue
+            data = self._parser.feed(line)
+            if data:
+                out.append(data)
+        del buf[:end + 1]
+        return out
+
+    def _check_seq(self, seq):
+        if seq is None:
+            return
+        if self._last_seq is not None:
+            gap = (seq - self._last_seq - 1) & 0xFFFF
+            if gap < 0x8000:  # larger "gaps" are a board reset, not loss
+                self.dropped += gap
+        self._last_seq = seq
+
+
+def parse_log(data):
+    """
+    Parse a captured serial log (bytes or str) into columnar arrays.
+    Returns {field: float64 array} with one entry per block; missing fields are NaN.
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    columns = {field: [] for field in FIELDS}
+    nan = float("nan")
+    row = {}
+    for line in data.splitlines():
+        if SEPARATOR in line:
+            if row:
+                for field in FIELDS:
+                    columns[field].append(row.get(field, nan))
+                row = {}
+            continue
+        _parse_line(line, row)
+    import numpy as np
+    return {field: np.array(values, dtype=np.float64) for field, values in columns.items()}
+
+
+def read_serial(port="COM3", baud=9600, timeout=1, yield_idle=False):
+    """
+    Generator yielding dicts of parsed data blocks (text or binary frames).
+    Idle waits block in poll() on the port (a blocking read on Windows), so a
+    quiet port costs no CPU; timeout=None waits indefinitely. With yield_idle,
+    None is yielded each time `timeout` passes without data, so callers can do
+    periodic work on a quiet port.
     """
     try:
-        ser = serial.Serial(port, baud, timeout=timeout)
+        ser = serial.Serial(port, baud, timeout=0 if _HAS_POLL else timeout)
         time.sleep(1)  # give Arduino reset time
     except Exception as e:
         raise RuntimeError(f"Could not open serial port {port}: {e}")
 
-    buffer = ""
+    if _HAS_POLL:
+        poller = select.poll()
+        poller.register(ser.fileno(), select.POLLIN)
+        wait_ms = None if timeout is None else int(timeout * 1000)
+
+    decoder = StreamDecoder()
     while True:
         try:
-            line = ser.readline().decode(errors="ignore")
-            if not line:
-                time.sleep(0.05)
+            if _HAS_POLL:
+                events = poller.poll(wait_ms)
+                if not events:
+                    if yield_idle:
+                        yield None
+                    continue
+                if events[0][1] & (select.POLLHUP | select.POLLERR | select.POLLNVAL):
+                    raise serial.SerialException(f"{port} disconnected")
+                chunk = ser.read(ser.in_waiting or 1)
+            else:
+                chunk = ser.read(ser.in_waiting or 1)
+            if not chunk:
+                if yield_idle and not _HAS_POLL:
+                    yield None
                 continue
-            buffer += line
-            if "------" in buffer:
-                data = parse_block(buffer)
-                buffer = ""
+            crc_errors, dropped = decoder.crc_errors, decoder.dropped
+            with metrics.stage("decode"):
+                readings = decoder.feed(chunk)
+            if decoder.crc_errors != crc_errors:
+                metrics.inc("crc_errors", decoder.crc_errors - crc_errors)
+            if decoder.dropped != dropped:
+                metrics.inc("dropped_frames", decoder.dropped - dropped)
+            for data in readings:
+                metrics.inc("blocks_read")
+                if not all(f in data for f in FIELDS):
+                    metrics.inc("parse_failures", help="blocks missing one or more sensor fields")
                 yield data
         except Exception as e:
             # if serial fails, break generator
+            metrics.inc("serial_errors")
             break
     ser.close()
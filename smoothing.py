@@ -0,0 +1,248 @@
+# smoothing.py
+import threading
+from collections import deque
+
+import numpy as np
+
+# Continuous sensor fields that get smoothed; water_level is a 0/1 switch and passes through.
+SMOOTHED_FIELDS = ("tds", "ph", "light", "temperature")
+
+
+class _FieldState:
+    """Despike ring, spread window of raw samples, Welford sums and EWMA for one field of one tank."""
+
+    __slots__ = ("ring", "recent", "n", "mean", "m2", "ewma")
+
+    def __init__(self, window, spread_window):
+        self.ring = deque(maxlen=window)
+        self.recent = deque(maxlen=spread_window)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma = None
+
+
+# MAD * 1.4826 estimates the standard deviation of Gaussian noise.
+MAD_SIGMA = 1.4826
+
+
+class StreamFilter:
+    """
+    Streaming smoothing and spike detection for one tank, O(1) time and memory per sample.
+
+    For each field, a sample x is:
+      - flagged anomalous when, after `warmup` samples, |x - median| > z_threshold * sigma,
+        where median and sigma (MAD * 1.4826) are taken over the previous
+        `spread_window` raw samples, so the test follows slow drift and is not
+        inflated by the spikes it is looking for,
+      - despiked: replaced by the median of the last `window` raw samples,
+      - folded into an EWMA (weight `alpha`) and a Welford running mean/variance
+        as the despiked value.
+    The EWMA is what consumers see. NaN samples leave the state unchanged.
+    filter_history() computes the same thing for whole arrays.
+    """
+
+    def __init__(self, fields=SMOOTHED_FIELDS, alpha=0.3, window=5, z_threshold=4.0, warmup=20,
+                 spread_window=60):
+        self.fields = tuple(fields)
+        self.alpha = alpha
+        self.window = window
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.spread_window = spread_window
+        self._state = {f: _FieldState(window, spread_window) for f in self.fields}
+
+    def update(self, reading):
+        """
+        Return (smoothed reading, anomalous fields). The smoothed reading is a copy
+        of `reading` with filtered fields replaced by their EWMA and the raw values
+        kept under "raw".
+        """
+        out = dict(reading)
+        raw, anomalies = {}, []
+        for field in self.fields:
+            x = reading.get(field)
+            if x is None:
+                continue
+            raw[field] = x
+            st = self._state[field]
+            if x != x:  # NaN
+                if st.ewma is not None:
+                    out[field] = st.ewma
+                continue
+            if len(st.recent) >= self.warmup:
+                center, sigma = _robust_spread(st.recent)
+                if sigma > 0 and abs(x - center) > self.z_threshold * sigma:
+                    anomalies.append(field)
+            st.recent.append(x)
+            st.ring.append(x)
+            med = _median(st.ring)
+            st.n += 1
+            delta = med - st.mean
+            st.mean += delta / st.n
+            st.m2 += delta * (med - st.mean)
+            st.ewma = med if st.ewma is None else st.ewma + self.alpha * (med - st.ewma)
+            out[field] = st.ewma
+        out["raw"] = raw
+        out["anomalies"] = anomalies
+        return out, anomalies
+
+    def stats(self, field):
+        st = self._state[field]
+        center, sigma = _robust_spread(st.recent) if st.recent else (None, 0.0)
+        std = (st.m2 / (st.n - 1)) ** 0.5 if st.n > 1 else 0.0
+        return {"n": st.n, "mean": st.mean, "std": std, "median": center, "sigma": sigma, "ewma": st.ewma}
+
+
+def _median(ring):
+    s = sorted(ring)
+    mid = len(s) // 2
+    return s[mid] if len(s) % 2 else 0.5 * (s[mid - 1] + s[mid])
+
+
+def _robust_spread(samples):
+    """(median, MAD * 1.4826) of a small window of samples."""
+    center = _median(samples)
+    return center, MAD_SIGMA * _median([abs(v - center) for v in samples])
+
+
+class TankFilters:
+    """
+    One StreamFilter per tank, shared between threads/sessions.
+    Readings carrying a "ts" that is not newer than the tank's last one return
+    the previous result instead of advancing the filter twice.
+    """
+
+    def __init__(self, **params):
+        self.params = params
+        self._filters = {}
+        self._last = {}  # tank -> (ts, result)
+        self._lock = threading.Lock()
+
+    def update(self, tank, reading):
+        with self._lock:
+            ts = reading.get("ts")
+            last = self._last.get(tank)
+            if ts is not None and last is not None and ts <= last[0]:
+                return last[1]
+            filt = self._filters.get(tank)
+            if filt is None:
+                filt = self._filters[tank] = StreamFilter(**self.params)
+            result = filt.update(reading)
+            if ts is not None:
+                self._last[tank] = (ts, result)
+            return result
+
+
+def smooth_stream(readings, **params):
+    """Wrap a reading generator (e.g. serial_reader.read_serial) and yield smoothed readings."""
+    filt = StreamFilter(**params)
+    for reading in readings:
+        yield filt.update(reading)[0]
+
+
+# --- batch ---------------------------------------------------------------------
+
+def _ewma(x, alpha):
+    """Exact EWMA (y0 = x0) in closed form, chunk by chunk to keep the powers in range."""
+    if alpha >= 1.0 or not len(x):
+        return x.copy()
+    y = np.empty_like(x)
+    decay = 1.0 - alpha
+    # Longest chunk whose smallest power stays above ~1e-200
+    chunk = max(1, min(1024, int(-200 / np.log10(decay))))
+    powers = decay ** np.arange(1, chunk + 1)
+    prev = y[0] = x[0]
+    for i in range(1, len(x), chunk):
+        xs = x[i:i + chunk]
+        p = powers[:len(xs)]
+        y[i:i + len(xs)] = p * prev + alpha * p * np.cumsum(xs / p)
+        prev = y[i + len(xs) - 1]
+    return y
+
+
+def _rolling_spread(x, spread_window, warmup, chunk=65536):
+    """
+    Median and MAD sigma of the `spread_window` samples before each sample
+    (fewer before that many exist, NaN before `warmup`).
+    """
+    m = len(x)
+    center = np.full(m, np.nan)
+    sigma = np.full(m, np.nan)
+    for i in range(warmup, min(spread_window, m)):
+        center[i], sigma[i] = _robust_spread(x[:i])
+    if m > spread_window:
+        # Window j covers x[j:j + spread_window] and is the history of sample j + spread_window
+        windows = np.lib.stride_tricks.sliding_window_view(x[:-1], spread_window)
+        for start in range(0, len(windows), chunk):
+            w = windows[start:start + chunk]
+            med = np.median(w, axis=1)
+            lo = spread_window + start
+            center[lo:lo + len(w)] = med
+            sigma[lo:lo + len(w)] = MAD_SIGMA * np.median(np.abs(w - med[:, None]), axis=1)
+    return center, sigma
+
+
+def filter_history(values, alpha=0.3, window=5, z_threshold=4.0, warmup=20, spread_window=60):
+    """
+    StreamFilter for a whole 1-D series at once.
+    Returns {"smoothed", "despiked", "mean", "std", "median", "sigma", "anomaly"} arrays;
+    mean/std are the running Welford stats after each sample, median/sigma what it
+    was tested against. NaN samples get the previous smoothed value.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    valid = ~np.isnan(values)
+    x = values[valid]
+    m = len(x)
+
+    # Median of the last `window` samples (fewer at the start)
+    despiked = np.empty(m)
+    head = min(window - 1, m)
+    for i in range(head):
+        despiked[i] = np.median(x[:i + 1])
+    if m >= window:
+        despiked[head:] = np.median(np.lib.stride_tricks.sliding_window_view(x, window), axis=1)
+
+    center, sigma = _rolling_spread(x, spread_window, warmup)
+    with np.errstate(invalid="ignore"):
+        anomaly = (sigma > 0) & (np.abs(x - center) > z_threshold * sigma)
+
+    smoothed = _ewma(despiked, alpha)
+
+    # Running mean/variance from cumulative sums, shifted by the first value for precision
+    shift = despiked[0] if m else 0.0
+    s = despiked - shift
+    count = np.arange(1, m + 1)
+    s1 = np.cumsum(s)
+    s2 = np.cumsum(s * s)
+    mean = s1 / count + shift
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = np.where(count > 1, (s2 - s1 * s1 / count) / (count - 1), 0.0)
+    std = np.sqrt(np.maximum(var, 0.0))
+
+    out = {}
+    for name, arr in (
+        ("smoothed", smoothed),
+        ("despiked", despiked),
+        ("mean", mean),
+        ("std", std),
+        ("median", center),
+        ("sigma", sigma),
+    ):
+        full = np.full(n, np.nan)
+        full[valid] = arr
+        out[name] = full
+    # NaN samples carry the last smoothed value forward, as the streaming filter does
+    idx = np.where(valid, np.arange(n), -1)
+    np.maximum.accumulate(idx, out=idx)
+    out["smoothed"] = np.where(idx >= 0, out["smoothed"][np.maximum(idx, 0)], np.nan)
+    anomaly_full = np.zeros(n, dtype=bool)
+    anomaly_full[valid] = anomaly
+    out["anomaly"] = anomaly_full
+    return out
+
+
+def filter_columns(columns, fields=SMOOTHED_FIELDS, **params):
+    """filter_history over each field of a columnar dict (parse_log output, store query)."""
+    return {f: filter_history(columns[f], **params) for f in fields if f in columns}
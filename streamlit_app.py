@@ -1,50 +1,105 @@
 # streamlit_app.py
 import streamlit as st
-import serial
 import serial.tools.list_ports
 import time
-import joblib
-import pandas as pd
+import os
+
+import metrics
+from alerts import AlertEngine
+from dashboard_render import Panel
+from dosing import compute_dose
+from estimate_npk import plant_stages
+from npk_surface import NPKSurface
+from prediction_cache import PredictionCache
+from serial_hub import SerialHub
+from sensor_store import SensorStore
+from serial_reader import FIELDS, parse_block
+from smoothing import TankFilters
+from trends import TREND_FIELDS, ZOOMS, TrendCache
 
 st.set_page_config(page_title="Hydroponics Fertilizer Calculator", layout="wide")
 
 # Load ML Model & Dataset
 @st.cache_resource
-def load_model():
-    return joblib.load("models/npk_model.pkl")
+def load_predictor():
+    return PredictionCache("models/npk_model.pkl", server_url=os.environ.get("HYDRO_PREDICT_URL"))
+
+@st.cache_resource(max_entries=2)
+def load_surface(stamp):
+    # Optional precomputed table from npk_surface.py. Keyed on the file stamps so a
+    # retrain or rebuild reloads it; a table built from another model is rejected
+    # and targets come from the predictor instead.
+    if stamp is None:
+        return None
+    try:
+        return NPKSurface.load("models/npk_surface.npz", model_path="models/npk_model.pkl")
+    except (OSError, ValueError):
+        return None
+
+def surface_stamp():
+    stamps = []
+    for path in ("models/npk_surface.npz", "models/npk_model.pkl"):
+        try:
+            info = os.stat(path)
+        except OSError:
+            if path.endswith(".npz"):
+                return None
+            continue
+        stamps.append((info.st_mtime_ns, info.st_size, info.st_ino))
+    return tuple(stamps)
 
 @st.cache_data
 def load_data():
-    df = pd.read_csv("data/hydro_data.csv")
-    df.columns = ["plant", "stage", "temperature", "humidity", "light_lux", "age_days", "N", "P", "K"]
-    return df
+    # Only the plant/stage pickers need the dataset; npk_ratios.csv lists the same
+    # pairs and reads without pandas, so the dataset is only the fallback
+    pairs = plant_stages()
+    if not pairs:
+        from dataset import load_dataset
+        df = load_dataset(columns=["plant", "stage"])
+        for p, s in sorted(set(zip(df["plant"].astype(str), df["stage"].astype(str)))):
+            pairs.setdefault(p, []).append(s)
+    return pairs
+
+@st.cache_resource
+def load_store():
+    return SensorStore()
+
+@st.cache_resource
+def load_filters():
+    # Per-tank EWMA / median spike filter between the serial reader and everything downstream
+    return TankFilters()
+
+@st.cache_resource
+def start_metrics():
+    # Prometheus text on :9108/metrics, optional JSON-lines trace (see metrics.start_from_env)
+    return metrics.start_from_env()
+
+@st.cache_resource
+def load_trends():
+    # LTTB-downsampled history per zoom level, shared by every session
+    return TrendCache(load_store(), budget=600)
+
+@st.cache_resource
+def load_alerts():
+    # Shared by every session so hysteresis/debounce state is per tank, not per browser tab
+    return AlertEngine.from_config()
 
-model = load_model()
-data_df = load_data()
+predictor = load_predictor()
+store = load_store()
+alerts = load_alerts()
+filters = load_filters()
+trends = load_trends()
+start_metrics()
+stages_by_plant = load_data()
 
 # Serial Port Handling
 def get_serial_ports():
     return [p.device for p in serial.tools.list_ports.comports()]
 
-# Session State
-if "ser" not in st.session_state:
-    st.session_state.ser = None
-if "serial_ready" not in st.session_state:
-    st.session_state.serial_ready = False
-if "loop_counter" not in st.session_state:
-    st.session_state.loop_counter = 0
-
-def open_serial(port):
-    if st.session_state.ser is None:
-        try:
-            st.session_state.ser = serial.Serial(port, 9600, timeout=1)
-            time.sleep(2)
-            st.session_state.serial_ready = True
-            return True
-        except:
-            st.session_state.serial_ready = False
-            return False
-    return st.session_state.serial_ready
+# One background reader per port, shared by every session
+@st.cache_resource
+def get_hub(port):
+    return SerialHub(port).start()
 
 # Sidebar Settings
 with st.sidebar:
@@ -57,10 +112,9 @@ with st.sidebar:
     
     port = st.selectbox("Arduino Port", ports)
     
-    plant = st.selectbox("Plant Type", sorted(data_df["plant"].unique()))
+    plant = st.selectbox("Plant Type", sorted(stages_by_plant))
     
-    stages = sorted(data_df[data_df["plant"] == plant]["stage"].unique())
-    stage = st.selectbox("Growth Stage", stages)
+    stage = st.selectbox("Growth Stage", stages_by_plant[plant])
     
     col1, col2 = st.columns([3, 1])
     with col1:
@@ -74,40 +128,26 @@ with st.sidebar:
     else:
         water_level = water_amount
     
+    trend_zoom = st.selectbox("Trend Range", list(ZOOMS), index=2)
+    
+    refresh_seconds = st.slider("Refresh interval (s)", min_value=0.25, max_value=5.0, value=1.0, step=0.25)
+    
     st.markdown("---")
     st.caption("Using NPK 19-19-19 fertilizer")
 
 # Parse Arduino Data
 def parse_arduino_block(block):
-    data = {}
-    try:
-        for line in block.split("\n"):
-            line = line.strip()
-            if line.startswith("TDS:"):
-                data["tds"] = float(line.split(":")[1].replace("ppm", "").strip())
-            elif line.startswith("pH:"):
-                data["ph"] = float(line.split(":")[1].strip())
-            elif line.startswith("Water Level:"):
-                data["water_level"] = float(line.split(":")[1].strip())
-            elif line.startswith("Light:"):
-                data["light"] = float(line.split(":")[1].strip())
-            elif line.startswith("Temperature:"):
-                data["temperature"] = float(line.split(":")[1].strip())
-        return data if len(data) == 5 else None
-    except:
-        return None
+    data = parse_block(block)
+    return data if all(f in data for f in FIELDS) else None
+
+# Read Serial (the hub reads in the background; this never blocks)
+STALE_SECONDS = 5.0
 
-# Read Serial
 def read_serial():
-    if not open_serial(port):
-        return None
-    try:
-        raw = ""
-        for _ in range(6):
-            raw += st.session_state.ser.readline().decode(errors="ignore")
-        return parse_arduino_block(raw)
-    except:
-        return None
+    if st.session_state.get("sub_port") != port:
+        st.session_state.subscription = get_hub(port).subscribe()
+        st.session_state.sub_port = port
+    return [d for d in st.session_state.subscription.drain() if all(f in d for f in FIELDS)]
 
 # Custom CSS for modern look
 st.markdown("""
@@ -173,166 +213,202 @@ st.markdown("""
 # Main UI
 st.title("Hydroponics Monitor")
 
-# Placeholders
-main_placeholder = st.empty()
-status_placeholder = st.empty()
-notification_placeholder = st.empty()
-advanced_placeholder = st.empty()
+# Placeholders (redrawn only when what they show changes)
+main_panel = Panel(st.empty())
+status_panel = Panel(st.empty())
+notification_panel = Panel(st.empty())
+advanced_panel = Panel(st.empty())
+trend_panel = Panel(st.empty())
+
+def process(raw_data, timer):
+    """Smooth, predict, persist and update alerts for one reading (laps: targets, store_alerts)."""
+    # Smoothed values drive targets, dosing and alerts; the raw reading is stored
+    sensor_data, anomalies = filters.update(port, raw_data)
+    
+    # Get predicted NPK values
+    # Interpolated from the precomputed surface when available
+    surface = load_surface(surface_stamp())
+    targets = surface.lookup(plant, stage, sensor_data["temperature"], sensor_data["light"]) if surface else None
+    if targets is None:
+        # Cached: plant/stage are fixed and temperature/light drift slowly
+        targets = predictor.predict(
+            plant,
+            stage,
+            temperature=sensor_data["temperature"],
+            light_lux=sensor_data["light"],
+            humidity=65,  # Default if not measured
+            age_days=30  # Default age value
+        )
+    timer.lap("targets")
+    
+    # Persist once per reading (other sessions see the same ts and are skipped);
+    # alert state advances only for readings not seen before
+    if store.tank(port).append(raw_data, npk=targets):
+        alerts.update(port, sensor_data)
+    timer.lap("store_alerts")
+    return sensor_data, anomalies, targets
+
+def render_main(grams_needed, total_grams):
+    if grams_needed < 0.1:
+        main_panel.markdown("""
+            <div class="main-card">
+                <h2>System Status</h2>
+                <div class="fertilizer-amount">All Good</div>
+                <p style="font-size: 1.2rem;">No fertilizer needed</p>
+            </div>
+        """)
+    else:
+        # Display in the unit the user selected
+        main_panel.markdown(f"""
+            <div class="main-card">
+                <h2>Add Fertilizer</h2>
+                <div class="fertilizer-amount">{total_grams:.2f}g</div>
+                <p style="font-size: 1.2rem;">NPK 19-19-19 for {water_amount:.1f}{water_unit} tank</p>
+                <div class="tank-info">{grams_needed:.2f}g per liter</div>
+            </div>
+        """)
 
-# Main Loop
+def render_advanced(sensor_data, targets, dose):
+    current_N, current_P, current_K = dose["current"]
+    deficit_N, deficit_P, deficit_K = dose["deficit"]
+    pred_N, pred_P, pred_K = targets
+    grams_needed = dose["grams_per_liter"]
+    
+    # Show what this will provide
+    will_provide = grams_needed * 190
+    
+    readings = (
+        f"{sensor_data['temperature']:.1f} °C",
+        f"{sensor_data['ph']:.1f}",
+        f"{sensor_data['tds']:.0f} ppm",
+        f"{sensor_data['water_level']:.0f}",
+    )
+    npk = (
+        (f"{current_N:.0f} mg/L", f"Target: {pred_N:.0f}"),
+        (f"{current_P:.0f} mg/L", f"Target: {pred_P:.0f}"),
+        (f"{current_K:.0f} mg/L", f"Target: {pred_K:.0f}"),
+    )
+    addition = f"+{will_provide:.0f} mg/L" if grams_needed >= 0.1 else None
+    deficits = (f"{deficit_N:.0f} mg/L", f"{deficit_P:.0f} mg/L", f"{deficit_K:.0f} mg/L")
+    
+    def render():
+        with st.expander("Advanced Details", expanded=False):
+            st.markdown("### Sensor Readings")
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Temperature", readings[0])
+            col2.metric("pH", readings[1])
+            col3.metric("TDS", readings[2])
+            col4.metric("Water Level", readings[3])
+            
+            st.markdown("---")
+            st.markdown("### NPK Analysis")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Nitrogen (N)", *npk[0])
+            col2.metric("Phosphorus (P)", *npk[1])
+            col3.metric("Potassium (K)", *npk[2])
+            
+            if addition is not None:
+                st.markdown("---")
+                st.markdown("### Fertilizer Addition Impact")
+                col1, col2, col3 = st.columns(3)
+                col1.metric("N Addition", addition)
+                col2.metric("P Addition", addition)
+                col3.metric("K Addition", addition)
+            
+            st.markdown("---")
+            st.markdown("### Deficiencies")
+            col1, col2, col3 = st.columns(3)
+            col1.metric("N Deficit", deficits[0])
+            col2.metric("P Deficit", deficits[1])
+            col3.metric("K Deficit", deficits[2])
+            
+            cache_info = predictor.info()
+            st.caption(f"Prediction cache: {cache_info['hits']} hits, {cache_info['misses']} misses")
+    
+    # Cache counters change on every reading; they only refresh along with the values
+    advanced_panel.draw((readings, npk, addition, deficits), render)
+
+TREND_LABELS = {"tds": "TDS (ppm)", "ph": "pH", "temperature": "Temperature (°C)"}
+
+def render_trends():
+    series = [trends.series(port, field, trend_zoom) for field in TREND_FIELDS]
+    
+    def render():
+        import pandas as pd  # first chart only; keeps it off the startup path
+        st.markdown(f"### Trends ({trend_zoom})")
+        for col, field, (_, ts, values) in zip(st.columns(len(TREND_FIELDS)), TREND_FIELDS, series):
+            with col:
+                st.caption(TREND_LABELS[field])
+                st.line_chart(pd.DataFrame({field: values}, index=pd.to_datetime(ts, unit="s")), height=200)
+    
+    # Series versions only change once the window has moved by a bucket
+    trend_panel.draw((trend_zoom, tuple(version for version, _, _ in series)), render)
+
+# Main Loop: refresh on a fixed interval, independent of serial timing
+last_reading_at = time.monotonic()
 while True:
-    sensor_data = read_serial()
+    cycle_start = time.perf_counter()
+    timer = metrics.stopwatch()
+    new_readings = read_serial()
+    timer.lap("serial_read")
     
-    if sensor_data:
-        # Get predicted NPK values
-        df_input = pd.DataFrame([{
-            "plant": plant,
-            "stage": stage,
-            "temperature": sensor_data["temperature"],
-            "humidity": 65,  # Default if not measured
-            "light_lux": sensor_data["light"],
-            "age_days": 30  # Default age value
-        }])
-        
-        pred_N, pred_P, pred_K = model.predict(df_input)[0]
-        
-        # Calculate current NPK from TDS (simple approximation)
-        # Assuming TDS roughly represents total dissolved nutrients
-        total_pred = pred_N + pred_P + pred_K
-        current_N = (pred_N / total_pred) * sensor_data["tds"]
-        current_P = (pred_P / total_pred) * sensor_data["tds"]
-        current_K = (pred_K / total_pred) * sensor_data["tds"]
-        
-        # Calculate deficiencies
-        deficit_N = max(0, pred_N - current_N)
-        deficit_P = max(0, pred_P - current_P)
-        deficit_K = max(0, pred_K - current_K)
+    if new_readings:
+        last_reading_at = time.monotonic()
+        # Every reading goes through filters/store/alerts; only the newest is shown
+        for raw_data in new_readings:
+            sensor_data, anomalies, targets = process(raw_data, timer)
         
         # Calculate fertilizer needed (NPK 19-19-19)
-        # Each gram of fertilizer provides 190mg N, 190mg P, 190mg K per liter
-        # Find the limiting nutrient
-        grams_for_N = (deficit_N / 190) if deficit_N > 0 else 0
-        grams_for_P = (deficit_P / 190) if deficit_P > 0 else 0
-        grams_for_K = (deficit_K / 190) if deficit_K > 0 else 0
-        
-        # Use the maximum to ensure all needs are met
-        grams_needed = max(grams_for_N, grams_for_P, grams_for_K)
-        
-        # Determine notifications
-        notifications = []
+        dose = compute_dose(targets, sensor_data["tds"], water_level)
+        grams_needed = dose["grams_per_liter"]
+        timer.lap("dosing")
         
-        # pH notifications
-        if sensor_data["ph"] < 5.5:
-            notifications.append(("warning", "pH is too low. Add pH Up solution to raise acidity."))
-        elif sensor_data["ph"] > 7.0:
-            notifications.append(("warning", "pH is too high. Add pH Down solution to lower acidity."))
-        
-        # TDS notifications
-        if sensor_data["tds"] < 200:
-            notifications.append(("warning", "Nutrient concentration is low. Plants may not get enough food."))
-        elif sensor_data["tds"] > 1100:
-            notifications.append(("warning", "Nutrient concentration is too high. This may damage plant roots."))
-        
-        # Temperature notifications
-        if sensor_data["temperature"] < 18:
-            notifications.append(("info", "Temperature is below optimal range. Consider warming the environment."))
-        elif sensor_data["temperature"] > 28:
-            notifications.append(("info", "Temperature is above optimal range. Consider cooling the environment."))
+        # Determine notifications (alert_rules.json, with hysteresis)
+        active = alerts.active_alerts(port)
+        active_ids = {rule for _, _, rule in active}
+        notifications = [(level, message) for level, message, _ in active]
+        for field in anomalies:
+            notifications.append(("info", f"Spike in {field} reading ({raw_data[field]}) ignored."))
         
         # All good notification
         if not notifications:
             notifications.append(("success", "All parameters are within optimal range. System is healthy."))
         
         # Display Main Card
-        with main_placeholder.container():
-            if grams_needed < 0.1:
-                st.markdown(f"""
-                    <div class="main-card">
-                        <h2>System Status</h2>
-                        <div class="fertilizer-amount">All Good</div>
-                        <p style="font-size: 1.2rem;">No fertilizer needed</p>
-                    </div>
-                """, unsafe_allow_html=True)
-            else:
-                total_grams = grams_needed * water_level
-                # Display in the unit the user selected
-                display_amount = water_amount
-                display_unit = water_unit
-                
-                st.markdown(f"""
-                    <div class="main-card">
-                        <h2>Add Fertilizer</h2>
-                        <div class="fertilizer-amount">{total_grams:.2f}g</div>
-                        <p style="font-size: 1.2rem;">NPK 19-19-19 for {display_amount:.1f}{display_unit} tank</p>
-                        <div class="tank-info">{grams_needed:.2f}g per liter</div>
-                    </div>
-                """, unsafe_allow_html=True)
+        render_main(grams_needed, dose["total_grams"])
         
         # Status badges
-        with status_placeholder.container():
-            ph_status = "good" if 5.5 <= sensor_data["ph"] <= 7.0 else "warning"
-            ph_text = "pH Good" if ph_status == "good" else ("pH Too Low" if sensor_data["ph"] < 5.5 else "pH Too High")
-            
-            tds_status = "good" if 200 <= sensor_data["tds"] <= 1100 else "warning"
-            tds_text = "Nutrients Good" if tds_status == "good" else ("Nutrients Low" if sensor_data["tds"] < 200 else "Nutrients High")
-            
-            st.markdown(f"""
-                <div style="text-align: center; margin: 2rem 0;">
-                    <span class="status-badge status-{ph_status}">{ph_text}</span>
-                    <span class="status-badge status-{tds_status}">{tds_text}</span>
-                </div>
-            """, unsafe_allow_html=True)
+        ph_status = "warning" if active_ids & {"ph_low", "ph_high"} else "good"
+        ph_text = "pH Good" if ph_status == "good" else ("pH Too Low" if "ph_low" in active_ids else "pH Too High")
+        
+        tds_status = "warning" if active_ids & {"tds_low", "tds_high"} else "good"
+        tds_text = "Nutrients Good" if tds_status == "good" else ("Nutrients Low" if "tds_low" in active_ids else "Nutrients High")
+        
+        status_panel.markdown(f"""
+            <div style="text-align: center; margin: 2rem 0;">
+                <span class="status-badge status-{ph_status}">{ph_text}</span>
+                <span class="status-badge status-{tds_status}">{tds_text}</span>
+            </div>
+        """)
         
         # Display Notifications
-        with notification_placeholder.container():
-            for notif_type, notif_message in notifications:
-                st.markdown(f"""
-                    <div class="notification notification-{notif_type}">
-                        <span>{'✓' if notif_type == 'success' else '⚠' if notif_type == 'warning' else 'ℹ'}</span>
-                        <span>{notif_message}</span>
-                    </div>
-                """, unsafe_allow_html=True)
+        notification_panel.markdown("".join(f"""
+            <div class="notification notification-{notif_type}">
+                <span>{'✓' if notif_type == 'success' else '⚠' if notif_type == 'warning' else 'ℹ'}</span>
+                <span>{notif_message}</span>
+            </div>
+        """ for notif_type, notif_message in notifications))
         
         # Advanced Details (Collapsible)
-        with advanced_placeholder.container():
-            with st.expander("Advanced Details", expanded=False):
-                st.markdown("### Sensor Readings")
-                col1, col2, col3, col4 = st.columns(4)
-                col1.metric("Temperature", f"{sensor_data['temperature']:.1f} °C")
-                col2.metric("pH", f"{sensor_data['ph']:.1f}")
-                col3.metric("TDS", f"{sensor_data['tds']:.0f} ppm")
-                col4.metric("Water Level", f"{sensor_data['water_level']:.0f}")
-                
-                st.markdown("---")
-                st.markdown("### NPK Analysis")
-                
-                # Show what this will provide
-                will_provide_N = grams_needed * 190
-                will_provide_P = grams_needed * 190
-                will_provide_K = grams_needed * 190
-                
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Nitrogen (N)", f"{current_N:.0f} mg/L", f"Target: {pred_N:.0f}")
-                col2.metric("Phosphorus (P)", f"{current_P:.0f} mg/L", f"Target: {pred_P:.0f}")
-                col3.metric("Potassium (K)", f"{current_K:.0f} mg/L", f"Target: {pred_K:.0f}")
-                
-                if grams_needed >= 0.1:
-                    st.markdown("---")
-                    st.markdown("### Fertilizer Addition Impact")
-                    col1, col2, col3 = st.columns(3)
-                    col1.metric("N Addition", f"+{will_provide_N:.0f} mg/L")
-                    col2.metric("P Addition", f"+{will_provide_P:.0f} mg/L")
-                    col3.metric("K Addition", f"+{will_provide_K:.0f} mg/L")
-                
-                st.markdown("---")
-                st.markdown("### Deficiencies")
-                col1, col2, col3 = st.columns(3)
-                col1.metric("N Deficit", f"{deficit_N:.0f} mg/L")
-                col2.metric("P Deficit", f"{deficit_P:.0f} mg/L")
-                col3.metric("K Deficit", f"{deficit_K:.0f} mg/L")
+        render_advanced(sensor_data, targets, dose)
+        
+        # Trend charts
+        render_trends()
+        timer.lap("render")
     
-    else:
-        with main_placeholder.container():
-            st.error("Unable to read sensor data. Check Arduino connection.")
+    elif time.monotonic() - last_reading_at > STALE_SECONDS:
+        main_panel.draw("stale", lambda: st.error("Unable to read sensor data. Check Arduino connection."))
     
-    time.sleep(1)# streamlit_app.py
\ No newline at end of file
+    metrics.observe("cycle", time.perf_counter() - cycle_start)
+    with metrics.stage("sleep"):
+        time.sleep(max(0.0, refresh_seconds - (time.perf_counter() - cycle_start)))
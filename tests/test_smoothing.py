@@ -0,0 +1,54 @@
+import numpy as np
+
+from smoothing import StreamFilter, filter_history
+
+
+def _stream_flags(values, **params):
+    filt = StreamFilter(fields=("tds",), **params)
+    return np.array([bool(filt.update({"tds": v})[1]) for v in values])
+
+
+def test_clean_noise_is_not_flagged():
+    values = 600 + np.random.default_rng(0).normal(0, 20, 20_000)
+    assert filter_history(values)["anomaly"].mean() < 0.005
+
+
+def test_slow_drift_is_not_flagged():
+    rng = np.random.default_rng(1)
+    values = 600 + np.linspace(0, 400, 20_000) + rng.normal(0, 5, 20_000)
+    assert filter_history(values)["anomaly"].mean() < 0.005
+
+
+def test_spikes_are_flagged():
+    values = 600 + np.random.default_rng(2).normal(0, 20, 3000)
+    spikes = np.arange(100, 3000, 250)
+    values[spikes] += 400
+    assert filter_history(values)["anomaly"][spikes].all()
+
+
+def test_stream_matches_history():
+    values = 600 + np.random.default_rng(3).normal(0, 20, 2000)
+    values[::97] += 300
+    values[7] = np.nan
+    history = filter_history(values)
+    assert (_stream_flags(values) == history["anomaly"]).all()
+
+    filt = StreamFilter(fields=("tds",))
+    smoothed = np.array([filt.update({"tds": v})[0]["tds"] for v in values])
+    np.testing.assert_allclose(smoothed, history["smoothed"], rtol=0, atol=1e-9)
+
+
+def test_running_stats_match_history():
+    values = 600 + np.random.default_rng(4).normal(0, 20, 2000)
+    values[11] = np.nan
+    history = filter_history(values)
+    filt = StreamFilter(fields=("tds",))
+    for v in values:
+        filt.update({"tds": v})
+    stats = filt.stats("tds")
+    despiked = history["despiked"][~np.isnan(values)]
+    assert stats["n"] == len(despiked)
+    np.testing.assert_allclose(stats["mean"], despiked.mean(), rtol=1e-12)
+    np.testing.assert_allclose(stats["std"], despiked.std(ddof=1), rtol=1e-9)
+    np.testing.assert_allclose(history["mean"][-1], stats["mean"], rtol=1e-12)
+    np.testing.assert_allclose(history["std"][-1], stats["std"], rtol=1e-9)
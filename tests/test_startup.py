@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_profile_check():
+    # Forbidden eager imports and import-time budgets for every entry point;
+    # HYDRO_IMPORT_BUDGET_SCALE loosens the budgets on slow machines.
+    scale = os.environ.get("HYDRO_IMPORT_BUDGET_SCALE", "1.0")
+    proc = subprocess.run(
+        [sys.executable, "import_profile.py", "--check", "--budget-scale", scale],
+        capture_output=True, text=True, cwd=BASE,
+    )
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+
+
+def test_ratios_stay_available_as_dataframe():
+    code = (
+        "import sys, estimate_npk as e\n"
+        "assert e.RATIO_ROWS and 'pandas' not in sys.modules\n"
+        "df = e.ratios\n"
+        "assert list(df.columns) == e.RATIO_COLUMNS and len(df) == len(e.RATIO_ROWS)\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=BASE)
+    assert proc.returncode == 0, proc.stderr
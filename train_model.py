@@ -1,81 +1,286 @@
 # train_model.py
+import argparse
+import hashlib
+import json
+import math
+import time
+import numpy as np
 import pandas as pd
 import joblib
 import os
+import sklearn
+from sklearn.base import clone
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.multioutput import MultiOutputRegressor
 from sklearn.pipeline import Pipeline
 
-# Try different encodings
-encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-df = None
-
-for encoding in encodings:
-    try:
-        df = pd.read_csv("data/hydro_data.csv", encoding=encoding)
-        print(f"✅ Successfully loaded with {encoding} encoding")
-        break
-    except UnicodeDecodeError:
-        continue
-
-if df is None:
-    print("❌ Could not load CSV with any encoding. Please recreate the file.")
-    exit(1)
-
-# Rename columns if needed
-if "Temperature (°C)" in df.columns:
-    df.columns = ["plant", "stage", "temperature", "humidity", "light_lux", "age_days", "N", "P", "K"]
-
-print(f"✅ Loaded dataset with {len(df)} rows")
-print(f"Columns: {list(df.columns)}")
-
-# Features and target
-X = df[["plant", "stage", "temperature", "humidity", "light_lux", "age_days"]]
-y = df[["N", "P", "K"]]
-
-# Preprocessing
-preprocessor = ColumnTransformer(
-    transformers=[
-        ("cat", OneHotEncoder(handle_unknown="ignore"), ["plant", "stage"])
-    ],
-    remainder="passthrough"
-)
-
-# Model
-model = Pipeline([
-    ("pre", preprocessor),
-    ("rf", MultiOutputRegressor(
-        RandomForestRegressor(
-            n_estimators=400,
-            random_state=42,
-            n_jobs=-1
-        )
-    ))
-])
-
-# Train
-print("🔄 Training model...")
-model.fit(X, y)
-
-# Save model
-os.makedirs("models", exist_ok=True)
-joblib.dump(model, "models/npk_model.pkl")
-
-print("✅ Model saved: models/npk_model.pkl")
-
-# Calculate and save NPK ratios
-df["total"] = df["N"] + df["P"] + df["K"]
-df["rN"] = df["N"] / df["total"]
-df["rP"] = df["P"] / df["total"]
-df["rK"] = df["K"] / df["total"]
-
-ratios = (
-    df.groupby(["plant", "stage"])[["rN", "rP", "rK"]]
-    .mean()
-    .reset_index()
-)
-
-ratios.to_csv("models/npk_ratios.csv", index=False, encoding='utf-8')
-print("✅ Ratios saved: models/npk_ratios.csv")
\ No newline at end of file
+from dataset import load_dataset
+from forest_compiler import FlatForest, verify, verification_frame
+from npk_surface import build_checked
+
+FEATURES = ["plant", "stage", "temperature", "humidity", "light_lux", "age_days"]
+TARGETS = ["N", "P", "K"]
+
+MANIFEST_NAME = "train_manifest.json"
+# Appends grow each forest; past this multiple of n_estimators trees, retrain from scratch instead.
+MAX_GROWTH = 2
+
+
+def build_model(n_estimators=400):
+    # Preprocessing
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore"), ["plant", "stage"])
+        ],
+        remainder="passthrough"
+    )
+
+    # Model
+    return Pipeline([
+        ("pre", preprocessor),
+        ("rf", MultiOutputRegressor(
+            RandomForestRegressor(
+                n_estimators=n_estimators,
+                random_state=42,
+                n_jobs=-1
+            )
+        ))
+    ])
+
+
+def compute_ratios(df):
+    df = df.copy()
+    df["total"] = df["N"] + df["P"] + df["K"]
+    df["rN"] = df["N"] / df["total"]
+    df["rP"] = df["P"] / df["total"]
+    df["rK"] = df["K"] / df["total"]
+
+    return (
+        df.groupby(["plant", "stage"], observed=True)[["rN", "rP", "rK"]]
+        .mean()
+        .reset_index()
+    )
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _digest(values):
+    return hashlib.sha256(np.ascontiguousarray(values).tobytes()).hexdigest()
+
+
+def dataset_fingerprint(df):
+    """Per-row and per-column content hashes used to classify what changed between runs."""
+    row_hashes = pd.util.hash_pandas_object(df[FEATURES + TARGETS], index=False).to_numpy()
+    return {
+        "n_rows": len(df),
+        "rows": _digest(row_hashes),
+        "features": _digest(pd.util.hash_pandas_object(df[FEATURES], index=False).to_numpy()),
+        "targets": {
+            t: _digest(pd.util.hash_pandas_object(df[t], index=False).to_numpy()) for t in TARGETS
+        },
+        "categories": {c: sorted(df[c].astype(str).unique().tolist()) for c in ["plant", "stage"]},
+    }, row_hashes
+
+
+def config_hash(params):
+    payload = json.dumps(
+        {"features": FEATURES, "targets": TARGETS, "params": params, "sklearn": sklearn.__version__},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def plan_training(manifest, fingerprint, row_hashes, cfg_hash, model_exists):
+    """
+    Decide how much work a retrain needs:
+      ("skip", None)         nothing changed
+      ("refit", [targets])   same rows and features, only these target columns changed
+      ("grow", n_new_rows)   rows were only appended and introduce no new plant/stage
+      ("full", reason)       anything else
+    """
+    if manifest is None or not model_exists:
+        return "full", "no previous model"
+    if manifest["config"] != cfg_hash:
+        return "full", "features or hyperparameters changed"
+    old = manifest["dataset"]
+    if fingerprint["rows"] == old["rows"]:
+        return "skip", None
+    if fingerprint["n_rows"] == old["n_rows"] and fingerprint["features"] == old["features"]:
+        changed = [t for t in TARGETS if fingerprint["targets"][t] != old["targets"][t]]
+        return "refit", changed
+    n_old = old["n_rows"]
+    if fingerprint["n_rows"] > n_old and _digest(row_hashes[:n_old]) == old["rows"]:
+        for col, cats in fingerprint["categories"].items():
+            if not set(cats) <= set(old["categories"][col]):
+                return "full", f"new {col} values in appended rows"
+        return "grow", fingerprint["n_rows"] - n_old
+    return "full", "existing rows were modified"
+
+
+def growth(model, n_new, n_total):
+    """(trees grow_model would add per output, resulting trees per output)."""
+    rf = model.named_steps["rf"]
+    extra = max(10, math.ceil(rf.estimator.n_estimators * n_new / n_total))
+    return extra, max(len(est.estimators_) for est in rf.estimators_) + extra
+
+
+def grow_model(model, X, y, n_new, n_total):
+    """Warm-start: add trees to every output's forest, fitted on the full updated dataset."""
+    Xt = model.named_steps["pre"].transform(X)
+    extra, _ = growth(model, n_new, n_total)
+    for j, est in enumerate(model.named_steps["rf"].estimators_):
+        est.set_params(warm_start=True, n_estimators=len(est.estimators_) + extra)
+        est.fit(Xt, y.iloc[:, j].to_numpy())
+        est.set_params(warm_start=False)
+    return extra
+
+
+def refit_outputs(model, X, y, targets):
+    """Refit only the per-output forests whose target column changed."""
+    Xt = model.named_steps["pre"].transform(X)
+    rf = model.named_steps["rf"]
+    for t in targets:
+        j = TARGETS.index(t)
+        # Keep the tree count in line with the other outputs (they may have been grown)
+        est = clone(rf.estimator).set_params(n_estimators=len(rf.estimators_[j].estimators_))
+        rf.estimators_[j] = est.fit(Xt, y[t].to_numpy())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the NPK model.")
+    parser.add_argument("--data", default="data/hydro_data.csv")
+    parser.add_argument("--models", default="models", help="output directory")
+    parser.add_argument("--n-estimators", type=int, default=400)
+    parser.add_argument("--force", action="store_true", help="retrain from scratch even if nothing changed")
+    parser.add_argument("--full", action="store_true", help="never warm-start or refit single outputs")
+    parser.add_argument("--no-surface", action="store_true", help="skip (and remove) the npk_surface.npz lookup table")
+    args = parser.parse_args()
+
+    model_path = os.path.join(args.models, "npk_model.pkl")
+    manifest_path = os.path.join(args.models, MANIFEST_NAME)
+    params = {"n_estimators": args.n_estimators, "random_state": 42}
+    cfg_hash = config_hash(params)
+    manifest = None if args.force else load_manifest(manifest_path)
+    data_sha = file_sha256(args.data)
+
+    # Fast path: identical file and settings, nothing to parse
+    if (manifest and manifest["config"] == cfg_hash and manifest["file_sha256"] == data_sha
+            and os.path.exists(model_path)):
+        print(f"✅ {args.data} unchanged since last training, skipping")
+        return
+
+    df = load_dataset(args.data)
+
+    print(f"✅ Loaded dataset with {len(df)} rows")
+    print(f"Columns: {list(df.columns)}")
+
+    # Features and target
+    X = df[FEATURES]
+    y = df[TARGETS]
+
+    fingerprint, row_hashes = dataset_fingerprint(df)
+    action, detail = plan_training(manifest, fingerprint, row_hashes, cfg_hash, os.path.exists(model_path))
+    if args.full and action in ("grow", "refit"):
+        action, detail = "full", "--full"
+
+    if action == "skip":
+        print("✅ Dataset content unchanged, skipping")
+        manifest["file_sha256"] = data_sha
+        save_manifest(manifest_path, manifest)
+        return
+
+    model = None
+    if action == "grow":
+        model = joblib.load(model_path)
+        _, n_trees = growth(model, detail, len(df))
+        if n_trees > MAX_GROWTH * args.n_estimators:
+            # Appended trees are never pruned, so cap the forest by starting over
+            action, detail = "full", f"growing would reach {n_trees} trees per output, over {MAX_GROWTH}x n_estimators"
+
+    if action == "full":
+        print(f"🔄 Training model ({detail})...")
+        model = build_model(args.n_estimators)
+        model.fit(X, y)
+    else:
+        model = model or joblib.load(model_path)
+        if action == "grow":
+            print(f"🔄 {detail} new rows appended, growing forests...")
+            extra = grow_model(model, X, y, detail, len(df))
+            print(f"✅ Added {extra} trees per output")
+        else:
+            print(f"🔄 Only {', '.join(detail)} changed, refitting those outputs...")
+            refit_outputs(model, X, y, detail)
+
+    # Save model
+    os.makedirs(args.models, exist_ok=True)
+    joblib.dump(model, model_path)
+
+    print(f"✅ Model saved: {model_path}")
+
+    # Calculate and save NPK ratios
+    ratios_path = os.path.join(args.models, "npk_ratios.csv")
+    ratios = compute_ratios(df)
+    ratios.to_csv(ratios_path, index=False, encoding='utf-8')
+    print(f"✅ Ratios saved: {ratios_path}")
+
+    # Export flat NumPy forest for fast inference
+    forest_path = os.path.join(args.models, "npk_forest")
+    forest = FlatForest.from_pipeline(model)
+    diff = verify(model, forest, verification_frame(df))
+    forest.save(forest_path)
+    print(f"✅ Flat forest saved: {forest_path} (max diff vs sklearn {diff:.2e})")
+
+    # Rebuild the target surface; a surface from the previous model would be rejected on load
+    surface_path = os.path.join(args.models, "npk_surface.npz")
+    if args.no_surface:
+        if os.path.exists(surface_path):
+            os.remove(surface_path)
+    else:
+        pairs = df[["plant", "stage"]].drop_duplicates().astype(str).to_numpy().tolist()
+        try:
+            surface, max_err, _ = build_checked(model, pairs, model_path)
+        except ValueError as e:
+            if os.path.exists(surface_path):
+                os.remove(surface_path)
+            print(f"❌ Surface not saved: {e}")
+        else:
+            surface.save(surface_path)
+            print(f"✅ Surface saved: {surface_path} (max error {max_err.round(2).tolist()} mg/L)")
+
+    save_manifest(manifest_path, {
+        "config": cfg_hash,
+        "params": params,
+        "file_sha256": data_sha,
+        "dataset": fingerprint,
+        "last_action": action,
+        # Why a full retrain happened (e.g. the growth cap), or what a grow/refit touched
+        "action_detail": detail,
+        "trees_per_output": len(model.named_steps["rf"].estimators_[0].estimators_),
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+
+
+def save_manifest(path, manifest):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    main()
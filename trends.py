@@ -0,0 +1,102 @@
+# trends.py
+import threading
+import time
+
+import numpy as np
+
+from sensor_store import RESOLUTIONS
+
+# Zoom level -> seconds of history shown.
+ZOOMS = {
+    "1 hour": 3600,
+    "6 hours": 6 * 3600,
+    "1 day": 86400,
+    "7 days": 7 * 86400,
+    "30 days": 30 * 86400,
+    "90 days": 90 * 86400,
+}
+
+TREND_FIELDS = ("tds", "ph", "temperature")
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-triangle-three-buckets downsampling of (x, y) to n_out points.
+    Keeps the first and last point; from each of the n_out - 2 buckets in between
+    it keeps the point forming the largest triangle with the previously kept
+    point and the next bucket's mean. NaN points are dropped first.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = ~np.isnan(y)
+    if not keep.all():
+        x, y = x[keep], y[keep]
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x.copy(), y.copy()
+
+    # Bucket i covers [bounds[i], bounds[i + 1]) of the interior points 1 .. n - 2
+    bounds = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(np.intp) + 1
+    bounds[-1] = n - 1
+    counts = np.diff(bounds)
+    mean_x = np.add.reduceat(x[1:n - 1], bounds[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:n - 1], bounds[:-1] - 1) / counts
+    # The bucket after the last one is the final point itself
+    next_x = np.r_[mean_x[1:], x[-1]]
+    next_y = np.r_[mean_y[1:], y[-1]]
+
+    picked = np.empty(n_out, dtype=np.intp)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return x[picked], y[picked]
+
+
+class TrendCache:
+    """
+    Downsampled trend series per (tank, field, zoom), read from a SensorStore.
+
+    Short zooms read raw readings; longer ones read the coarsest rollup mean that
+    still has at least 2 * budget points in the window, so the LTTB input stays
+    bounded too. A cached series is reused until the clock has moved by one
+    output bucket (window / budget), so each zoom costs at most one recompute
+    per pixel of movement and every payload is at most `budget` points.
+    """
+
+    def __init__(self, store, budget=600):
+        self.store = store
+        self.budget = budget
+        self._cache = {}  # (tank, field, zoom) -> (computed_at, version, ts, values)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _source(self, tank_store, field, window, start, end):
+        for res in sorted(RESOLUTIONS, key=RESOLUTIONS.get, reverse=True):
+            if window / RESOLUTIONS[res] >= 2 * self.budget:
+                buckets = tank_store.rollup(res, start, end)
+                if len(buckets):
+                    return buckets["ts"], buckets[f"{field}_mean"]
+        rows = tank_store.query(start, end)
+        return rows["ts"], rows[field]
+
+    def series(self, tank, field, zoom, now=None):
+        """Return (version, ts, values) with at most `budget` points for the zoom level."""
+        window = ZOOMS[zoom]
+        now = time.time() if now is None else now
+        key = (tank, field, zoom)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and now - cached[0] < window / self.budget:
+                return cached[1:]
+        tank_store = self.store.tank(tank)
+        ts, values = self._source(tank_store, field, window, now - window, None)
+        ts, values = lttb(ts, values, self.budget)
+        with self._lock:
+            self._version += 1
+            self._cache[key] = (now, self._version, ts, values)
+            return self._version, ts, values